@@ -0,0 +1,183 @@
+"""
+
+This file contains the on-disk cache of the ASTs of source programs. The AST of a source program is flattened,
+pickled and compressed into a file named after a hash of the source program and the version of the compiler, so that
+a source program that has not changed since it was last compiled is loaded from the cache instead of being lexed and
+parsed. Pickling the AST itself would recurse once per level of nesting, so the AST is flattened into a list of its
+nodes, tokens and lists, and the references between them are kept as links that are put back when it is loaded.
+
+"""
+
+from array import array
+import glob
+import hashlib
+import os
+import pickle
+import zlib
+import astnodes as ast
+from tokens import Token
+
+# The directory next to this file that holds the cached ASTs
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ast_cache")
+
+# The version of the compiler, computed once per process by compiler_version
+COMPILER_VERSION = None
+
+# The types of the values in the AST that are flattened and linked to instead of being pickled in place
+LINKED_TYPES = (ast.ASTNode, Token, list)
+
+def compiler_version():
+
+    """
+
+    This function returns a checksum of the source files of the compiler. The AST of a source program depends on
+    the lexer, the parser and the AST nodes, so an AST cached by a different version of the compiler is not used.
+
+    Returns:
+        str: The checksum of the source files of the compiler.
+
+    """
+
+    global COMPILER_VERSION
+    if COMPILER_VERSION is None:
+        checksum = hashlib.sha256()
+        for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py"))):
+            if os.path.basename(path) != "generated_lexer.py": # Generated from the other files, and may be missing
+                with open(path, 'rb') as file:
+                    checksum.update(file.read())
+        COMPILER_VERSION = checksum.hexdigest()
+    return COMPILER_VERSION
+
+def cache_path(src_program_str, cache_dir=CACHE_DIR):
+
+    """
+
+    This function returns the path of the cached AST of a source program.
+
+    Parameters:
+        src_program_str (str): The source program string.
+        cache_dir (str): The directory that holds the cached ASTs.
+
+    Returns:
+        str: The path of the cached AST.
+
+    """
+
+    key = hashlib.sha256(compiler_version().encode())
+    key.update(src_program_str.encode("utf-8", "surrogatepass"))
+    return os.path.join(cache_dir, key.hexdigest() + ".ast")
+
+def flatten_ast(program_ast):
+
+    """
+
+    This function flattens an AST into a list of shallow copies of its nodes and lists, and its tokens, in which the
+    references to each other are replaced by None. The references are kept as links from a node or list to a value.
+
+    Parameters:
+        program_ast (ASTProgramNode): The AST to flatten.
+
+    Returns:
+        tuple: The list of nodes, lists and tokens, which starts with the program node, and the index of the node or
+               list, the attribute name or list index and the index of the value of every link.
+
+    """
+
+    objects = []
+    indices = {} # The index of every node, list and token, so that one shared by two nodes is flattened only once
+    link_parents = array('I')
+    link_keys = []
+    link_children = array('I')
+
+    stack = [(None, None, program_ast)] # An explicit stack, so that deep ASTs do not hit the recursion limit
+    while stack:
+        parent, key, value = stack.pop()
+        index = indices.get(id(value))
+        if index is None:
+            index = indices[id(value)] = len(objects)
+            if isinstance(value, list):
+                objects.append([None if isinstance(item, LINKED_TYPES) else item for item in value])
+                stack.extend((index, position, item) for position, item in enumerate(value) if isinstance(item, LINKED_TYPES))
+            elif isinstance(value, Token):
+                objects.append(value) # Tokens hold no references to the AST
+            else:
+                copy = object.__new__(type(value))
+                copy.__dict__.update((name, None if isinstance(item, LINKED_TYPES) else item) for name, item in vars(value).items())
+                objects.append(copy)
+                stack.extend((index, name, item) for name, item in vars(value).items() if isinstance(item, LINKED_TYPES))
+        if parent is not None:
+            link_parents.append(parent)
+            link_keys.append(key)
+            link_children.append(index)
+
+    return objects, link_parents, link_keys, link_children
+
+def unflatten_ast(objects, link_parents, link_keys, link_children):
+
+    """
+
+    This function puts the links of a flattened AST back into its nodes and lists.
+
+    Parameters:
+        objects (list): The nodes, lists and tokens of the AST.
+        link_parents (array): The index of the node or list of every link.
+        link_keys (list): The attribute name or list index of every link.
+        link_children (array): The index of the value of every link.
+
+    Returns:
+        ASTProgramNode: The AST.
+
+    """
+
+    containers = [vars(value) if isinstance(value, ast.ASTNode) else value for value in objects] # The links are set as items of these
+    for parent, key, child in zip(link_parents, link_keys, link_children):
+        containers[parent][key] = objects[child]
+    return objects[0]
+
+def load_ast(path):
+
+    """
+
+    This function loads a cached AST.
+
+    Parameters:
+        path (str): The path of the cached AST.
+
+    Returns:
+        ASTProgramNode: The cached AST, or None if it is missing or unreadable.
+
+    """
+
+    with ast.paused_gc(): # Unpickling the AST nodes is several times faster without the cycle collector running
+        try:
+            with open(path, 'rb') as file:
+                return unflatten_ast(*pickle.loads(zlib.decompress(file.read())))
+        except Exception: # A missing or corrupt cache is only a cache miss, and the source program is parsed again
+            return None
+
+def store_ast(path, program_ast):
+
+    """
+
+    This function writes an AST to the cache. An AST that cannot be pickled is not cached.
+
+    Parameters:
+        path (str): The path of the cached AST.
+        program_ast (ASTProgramNode): The AST to cache.
+
+    """
+
+    with ast.paused_gc():
+        try:
+            data = zlib.compress(pickle.dumps(flatten_ast(program_ast), pickle.HIGHEST_PROTOCOL), 1)
+        except (RecursionError, pickle.PicklingError): # Compiling goes on without the cache
+            return
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = path + "." + str(os.getpid()) # Write to a temporary file so that other processes never read a partial cache
+        with open(temporary_path, 'wb') as file:
+            file.write(data)
+        os.replace(temporary_path, path)
+    except OSError:
+        pass # The cache is only an optimization so compiling still works if it cannot be written
@@ -1,3 +1,24 @@
+from contextlib import contextmanager
+import gc
+
+@contextmanager
+def paused_gc():
+
+    """
+
+    Pauses the cycle collector while AST nodes are built, pickled or unpickled. The AST nodes hold no reference
+    cycles, so the cycle collector only slows these down. The collector is left as it was found afterwards.
+
+    """
+
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if gc_enabled:
+            gc.enable()
+
 # To do: should i have different nodes for each literal type???
 # to do: add statement node and pass it accordingly
 class ASTNode: 
@@ -11,6 +32,26 @@ class ASTNode:
     def __init__(self):
         self.name = "ASTNode"    
 
+    def __getattr__(self, name):
+
+        """
+
+        Computes the line number of a node that keeps it relative to the first line of its top-level statement,
+        as the nodes reused by the incremental parser do. It is only called for attributes the node does not have.
+
+        Parameters:
+            name (str): The name of the attribute.
+
+        Returns:
+            int: The line number of the node.
+
+        """
+
+        attributes = self.__dict__
+        if (name == "line_number" or name == "line") and "relative_" + name in attributes:
+            return attributes["line_origin"].line + attributes["relative_" + name]
+        raise AttributeError("'" + type(self).__name__ + "' object has no attribute '" + name + "'")
+
 class ASTProgramNode(ASTNode): 
     
     """
@@ -12,6 +12,7 @@ class CodeGenerationVisitor(ASTVisitor):
         self.output_file = open(output_file, "w") # Output file of where the generated code will be written
         self.output = [] # List of strings to be written to the output file
         self.current_block_length = 0 # Length of the current block
+        self.whole_array_nodes = set() # Variable nodes that push a whole array, kept here so that the AST is never modified
     
     def visit_program_node(self, node):
         self.output.append(".main\n") 
@@ -226,7 +227,7 @@ class CodeGenerationVisitor(ASTVisitor):
             self.output.append("push +[" + str(symbol.frame_index) + ":" + str(self.symbol_table.current_frame_level - symbol.frame_level) + "]\n")
             self.current_block_length += 1
         elif symbol.symbol_type == SymbolType.ARRAY:
-            node.length = symbol.value
+            self.whole_array_nodes.add(node)
             self.output.append("push " + str(symbol.value) + "\n")
             self.output.append("pusha [" + str(symbol.frame_index) + ":" + str(self.symbol_table.current_frame_level - symbol.frame_level) + "]\n")
             self.output.append("push " + str(symbol.value) + "\n")
@@ -538,7 +539,7 @@ class CodeGenerationVisitor(ASTVisitor):
         if expr_type != "int" and expr_type != "float" and expr_type != "bool" and expr_type != "colour":
             raise Exception("Invalid type for print operation on line ", line)
         
-        if isinstance(node.expression, ASTVariableNode) and node.expression.length != None:
+        if isinstance(node.expression, ASTVariableNode) and (node.expression.length != None or node.expression in self.whole_array_nodes):
             self.output.append("printa\n")
         else:
             self.output.append("print\n")
@@ -690,7 +691,8 @@ class CodeGenerationVisitor(ASTVisitor):
 
         return expr_type
 
-src_program = "let result:float = 1 as float;"
-parser = Parser(src_program)
-parser.Parse()
-parser.ASTroot.accept(CodeGenerationVisitor(output_file="output.txt"))
\ No newline at end of file
+if __name__ == "__main__": # Only when run directly, so that importing the visitor does not overwrite output.txt
+    src_program = "let result:float = 1 as float;"
+    parser = Parser(src_program)
+    parser.Parse()
+    parser.ASTroot.accept(CodeGenerationVisitor(output_file="output.txt"))
\ No newline at end of file
@@ -4,10 +4,29 @@ This file contains functionality related to the DFA that the lexer will use to t
 
 """
 
+import hashlib
+import marshal
+import os
 from enum import Enum
 
 DFAStates = Enum('DFAStates', {f'S_{i}': i for i in range(28)})
 
+# The input categories in the order of the columns of the compiled transition table
+CATEGORIES = ['digit', 'hex', 'letter', 'plus', 'minus', 'star', 'slash', 'punctuation', 'whitespace', 'newline', 'equals', 'less', 'greater', 'exclamation', 'hash', 'dot', 'underscore', 'other']
+CATEGORY_INDEX = {category: index for index, category in enumerate(CATEGORIES)}
+
+# The state used in the compiled transition table to mark a missing transition
+DEAD_STATE = 255
+
+# The file next to this one that caches the compiled tables of the DFA
+TABLE_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dfa_tables.marshal")
+
+# The DFA shared by every lexer in the process
+SHARED_DFA = None
+
+# Whether the shared DFA has been checked against the table cache, which happens once a lexer asks for the cache
+TABLE_CACHE_CHECKED = False
+
 def input_categories(character):
     
         """
@@ -57,17 +76,42 @@ def input_categories(character):
             case __:
                 return 'other'
 
+# The category index of each of the first 256 code points, precomputed from input_categories
+CHARACTER_CLASSES = bytes(CATEGORY_INDEX[input_categories(chr(code))] for code in range(256))
+
+def character_class(character):
+
+        """
+
+        This function returns the category index of a character, looking it up in CHARACTER_CLASSES
+        and only falling back to input_categories for characters outside of that table.
+
+        Parameters:
+            character (str): The character to categorize.
+
+        """
+
+        code = ord(character)
+        if code < 256:
+            return CHARACTER_CLASSES[code]
+        return CATEGORY_INDEX[input_categories(character)]
+
 class DFA:
     """
     This class defines the DFA that the lexer will use to tokenize the input.
     """
 
-    def __init__(self):
+    def __init__(self, tables=None):
         self.states = DFAStates
         self.start_state = self.states.S_0
         self.final_states = [self.states.S_1, self.states.S_2, self.states.S_3, self.states.S_4, self.states.S_5, self.states.S_6, self.states.S_9, self.states.S_10, self.states.S_12, self.states.S_10, self.states.S_11, self.states.S_12,
                                  self.states.S_13, self.states.S_16, self.states.S_17, self.states.S_18, self.states.S_20, self.states.S_27]
         #self.current_state = self.states.S_0
+
+        if tables is not None: # The compiled tables were loaded from the table cache so the transitions are not rebuilt
+            self.transitions = None
+            self.table, self.accepting_bitmap, self.num_categories = tables
+            return
         
         # Define the transitions for the DFA as a dictionary
         self.transitions = {
@@ -160,6 +204,31 @@ class DFA:
             (self.states.S_26, 'digit'): self.states.S_27
         })
 
+        self.compile()
+
+    def compile(self):
+
+        """
+
+            This function compiles the transition dictionary into a flat integer matrix indexed by
+            state * number of categories + category, together with a bitmap of the accepting states.
+            Missing transitions are stored as DEAD_STATE.
+
+            """
+
+        self.num_categories = len(CATEGORIES)
+
+        table = bytearray([DEAD_STATE]) * (len(self.states) * self.num_categories)
+        for (state, category), next_state in self.transitions.items():
+            table[state.value * self.num_categories + CATEGORY_INDEX[category]] = next_state.value
+
+        accepting_bitmap = bytearray(len(self.states))
+        for state in self.final_states:
+            accepting_bitmap[state.value] = 1
+
+        self.table = bytes(table)
+        self.accepting_bitmap = bytes(accepting_bitmap)
+
     def accepting_states(self, state):
         
         """
@@ -173,3 +242,78 @@ class DFA:
     
         return state in self.final_states
 
+
+def definition_checksum():
+
+    """
+
+    This function returns a checksum of the source of this file, which defines the DFA.
+    A table cache written with a different checksum is out of date.
+
+    """
+
+    with open(os.path.abspath(__file__), 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+def load_dfa(path=TABLE_CACHE_PATH, dfa=None):
+
+    """
+
+    This function loads the DFA from the table cache at the given path. If the cache is missing, unreadable
+    or was written for a different DFA definition, the DFA is built and the cache is rewritten.
+
+    Parameters:
+        path (str): The path of the table cache.
+        dfa (DFA): A DFA that has already been built, which is returned instead of loading or building one.
+
+    Returns:
+        DFA: The loaded DFA.
+
+    """
+
+    checksum = definition_checksum()
+
+    try:
+        with open(path, 'rb') as file:
+            cache = marshal.load(file)
+        if cache["checksum"] == checksum:
+            return DFA((cache["table"], cache["accepting_bitmap"], cache["num_categories"])) if dfa is None else dfa
+    except (OSError, EOFError, ValueError, TypeError, KeyError):
+        pass # The cache is rebuilt below
+
+    dfa = DFA() if dfa is None else dfa
+    cache = {"checksum": checksum, "table": dfa.table, "accepting_bitmap": dfa.accepting_bitmap, "num_categories": dfa.num_categories}
+    try:
+        temporary_path = path + "." + str(os.getpid()) # Write to a temporary file so that other processes never read a partial cache
+        with open(temporary_path, 'wb') as file:
+            marshal.dump(cache, file)
+        os.replace(temporary_path, path)
+    except OSError:
+        pass # The cache is only an optimization so the DFA is still usable if it cannot be written
+
+    return dfa
+
+def shared_dfa(use_table_cache=False):
+
+    """
+
+    This function returns the DFA shared by every lexer in the process, building it on the first call. The first
+    call that asks for the table cache loads the DFA from it, or writes it with the DFA that is already shared if
+    an earlier call has built one without the cache.
+
+    Parameters:
+        use_table_cache (bool): Whether the DFA should be loaded from, or saved to, the table cache next to this file.
+
+    Returns:
+        DFA: The shared DFA.
+
+    """
+
+    global SHARED_DFA, TABLE_CACHE_CHECKED
+
+    if use_table_cache and not TABLE_CACHE_CHECKED:
+        SHARED_DFA = load_dfa(TABLE_CACHE_PATH, SHARED_DFA)
+        TABLE_CACHE_CHECKED = True
+    elif SHARED_DFA is None:
+        SHARED_DFA = DFA()
+    return SHARED_DFA
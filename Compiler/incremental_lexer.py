@@ -0,0 +1,119 @@
+"""
+
+This file contains the incremental re-lexing of edited source programs. After an edit, only the tokens from the
+last token boundary before the edit are lexed again, until the new tokens line up with the old ones, so the work
+done by the lexer depends on the size of the edit and not on the size of the source program.
+
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from tokens import TokenBuffer
+
+# The number of characters past the end of a lexeme that the DFA may read before it stops, e.g. the '.' and the
+# character after it in '1.x'. A token that ends at least this many characters before an edit is not affected by it.
+RELEX_LOOKAHEAD = 2
+
+def unterminated_comment_token(token_buffer, edit_offset):
+
+    """
+
+    This function finds the token that starts the first unterminated block comment before the edit offset. The DFA
+    reads an unterminated block comment up to the end of the input before it lexes its '/', so the tokens of the
+    comment depend on every character after it.
+
+    Parameters:
+        token_buffer (TokenBuffer): The tokens of the source program before the edit.
+        edit_offset (int): The index in the source program where the edit starts.
+
+    Returns:
+        int: The index of the '/' token that starts the unterminated block comment, or None if there is none.
+
+    """
+
+    src_program_str = token_buffer.src_program
+    starts = token_buffer.starts
+
+    # A block comment that is followed by a '*/' is terminated, so only the ones after the last '*/' can be unterminated
+    comment_idx = src_program_str.find("/*", max(src_program_str.rfind("*/") - 1, 0), edit_offset + 1)
+    while comment_idx != -1:
+        token_idx = bisect_left(starts, comment_idx)
+        if token_idx < len(starts) and starts[token_idx] == comment_idx: # The '/*' is lexed as tokens, not skipped as part of a comment
+            return token_idx
+        comment_idx = src_program_str.find("/*", comment_idx + 1, edit_offset + 1)
+    return None
+
+def shifted(offsets, shift):
+
+    """
+
+    This function returns a copy of the given offsets moved by the given number of characters.
+
+    Parameters:
+        offsets (array): The offsets to move.
+        shift (int): The number of characters to move the offsets by.
+
+    Returns:
+        array: The moved offsets.
+
+    """
+
+    if shift == 0:
+        return offsets
+    return array('I', map(shift.__add__, offsets))
+
+def relex(lexer, token_buffer, edit_offset, deleted_length, inserted_text):
+
+    """
+
+    This function updates the tokens of a source program after an edit. The tokens that end well before the edit are
+    kept, the source program is lexed again from the end of the last of them, and lexing stops at the first new token
+    after the edit that starts where an old token started, since the rest of the source program is unchanged from
+    there. The tokens after that point are kept with their offsets moved by the length of the edit.
+
+    Parameters:
+        lexer (Lexer): The lexer whose DFA lexes the edited part of the source program.
+        token_buffer (TokenBuffer): The tokens of the source program before the edit.
+        edit_offset (int): The index in the source program where the edit starts.
+        deleted_length (int): The number of characters deleted at the edit offset.
+        inserted_text (str): The text inserted at the edit offset.
+
+    Returns:
+        TokenBuffer: The tokens of the edited source program.
+        tuple: The index of the first changed token, the index one past the last replaced token in the old tokens
+               and the index one past the last new token in the new tokens.
+
+    """
+
+    old_src_program_str = token_buffer.src_program
+    if edit_offset < 0 or deleted_length < 0 or edit_offset + deleted_length > len(old_src_program_str):
+        raise Exception("Invalid edit: " + str(deleted_length) + " characters at offset " + str(edit_offset))
+
+    src_program_str = old_src_program_str[:edit_offset] + inserted_text + old_src_program_str[edit_offset + deleted_length:]
+    shift = len(inserted_text) - deleted_length
+    edit_end_idx = edit_offset + len(inserted_text) # The index one past the inserted text in the edited source program
+    kinds, starts, ends = token_buffer.kinds, token_buffer.starts, token_buffer.ends
+
+    first_changed = bisect_right(ends, edit_offset - RELEX_LOOKAHEAD) # The first token that may read the edited characters
+    if "*/" in src_program_str[max(edit_offset - 1, 0):edit_end_idx + 1]: # The edit may terminate an unterminated block comment
+        comment_token = unterminated_comment_token(token_buffer, edit_offset)
+        if comment_token is not None:
+            first_changed = min(first_changed, comment_token)
+    restart_idx = ends[first_changed - 1] if first_changed > 0 else 0
+
+    new_token_buffer = TokenBuffer(src_program_str, token_buffer.line_index.edit(src_program_str, edit_offset, deleted_length, inserted_text), token_buffer.intern_table)
+    resync_token = len(kinds) # Every edit is followed by the EOF token at the latest, so this is always replaced
+    for token_type, start_idx, end_idx in lexer.iter_dfa_spans(src_program_str, restart_idx):
+        if start_idx >= edit_end_idx: # The source programs are the same from here, so an old token that starts here has not changed
+            resync_token = bisect_left(starts, start_idx - shift, first_changed)
+            if resync_token < len(starts) and starts[resync_token] == start_idx - shift:
+                break
+        new_token_buffer.append(token_type, start_idx, end_idx)
+
+    num_new_tokens = len(new_token_buffer)
+    symbol_ids = token_buffer.symbol_ids
+    new_token_buffer.kinds = kinds[:first_changed] + new_token_buffer.kinds + kinds[resync_token:]
+    new_token_buffer.starts = starts[:first_changed] + new_token_buffer.starts + shifted(starts[resync_token:], shift)
+    new_token_buffer.ends = ends[:first_changed] + new_token_buffer.ends + shifted(ends[resync_token:], shift)
+    new_token_buffer.symbol_ids = symbol_ids[:first_changed] + new_token_buffer.symbol_ids + symbol_ids[resync_token:]
+    return new_token_buffer, (first_changed, resync_token, first_changed + num_new_tokens)
@@ -0,0 +1,261 @@
+"""
+
+This file contains the incremental reparsing of edited programs. The tokens of a program are split into its
+top-level statements, and the AST of every statement is cached under a hash of the text of its tokens. After an
+edit, only the statements whose text has changed are parsed again, and the AST objects of the other statements are
+reused as they are. Their nodes and tokens keep their line numbers relative to the first line of their statement,
+so that an edit that adds or removes lines before a statement moves all of them by changing that one line. A
+program returned before shares its unchanged statements with the new one, and so sees their new line numbers.
+
+"""
+
+import hashlib
+import re
+import astnodes as ast
+from lexer import Lexer
+from parser_ import Parser
+from tokens import Token, TokenType
+
+# Matches the tokens that decide where the top-level statements end
+STATEMENT_END_PATTERN = re.compile(b"[" + re.escape(bytes([
+    TokenType.SEMICOLON.value, TokenType.LEFT_BRACE.value, TokenType.RIGHT_BRACE.value,
+    TokenType.LEFT_PAREN.value, TokenType.RIGHT_PAREN.value,
+])) + b"]")
+
+# The attributes that AST nodes keep their line numbers in
+LINE_ATTRIBUTES = ("line_number", "line")
+
+# The types of the attributes of AST nodes that can contain other AST nodes
+NESTED_TYPES = (ast.ASTNode, list)
+
+def split_statements(token_buffer):
+
+    """
+
+    This function splits the tokens of a program into its top-level statements. A statement ends at a ';' outside of
+    any parentheses and braces, or at a '}' that closes its outermost brace, unless an 'else' follows the '}'.
+
+    Parameters:
+        token_buffer (TokenBuffer): The tokens of the program.
+
+    Returns:
+        list: The index of the first token and the index one past the last token of every statement.
+
+    """
+
+    kinds = token_buffer.kinds
+    num_tokens = len(kinds) - 1 # Without the EOF token
+    statements = []
+    statement_start = 0
+    brace_depth = 0
+    paren_depth = 0
+
+    for match in STATEMENT_END_PATTERN.finditer(kinds, 0, num_tokens):
+        token_idx = match.start()
+        kind = kinds[token_idx]
+        if kind == TokenType.LEFT_PAREN.value:
+            paren_depth += 1
+        elif kind == TokenType.RIGHT_PAREN.value:
+            paren_depth -= 1
+        elif kind == TokenType.LEFT_BRACE.value:
+            brace_depth += 1
+        elif kind == TokenType.RIGHT_BRACE.value:
+            brace_depth -= 1
+            if brace_depth == 0 and paren_depth == 0 and kinds[token_idx + 1] != TokenType.ELSE.value:
+                statements.append((statement_start, token_idx + 1))
+                statement_start = token_idx + 1
+        elif brace_depth == 0 and paren_depth == 0: # A ';' that ends a statement
+            statements.append((statement_start, token_idx + 1))
+            statement_start = token_idx + 1
+
+    if statement_start < num_tokens:
+        statements.append((statement_start, num_tokens))
+    return statements
+
+class LineOrigin:
+
+    """
+
+    This class holds the first line of a cached top-level statement, which the line numbers of its nodes and tokens
+    are relative to, so that they all move when it is changed.
+
+    """
+
+    __slots__ = ("line",)
+
+    def __init__(self, line):
+        self.line = line
+
+class RelativeToken(Token):
+
+    """
+
+    This class represents a token of a cached top-level statement, whose line number is relative to the first line
+    of the statement. It is pickled as a plain token with its current line number.
+
+    """
+
+    __slots__ = ("relative_line", "line_origin")
+
+    def __init__(self, TokenType, value, relative_line, symbol_id, line_origin):
+        self.TokenType = TokenType
+        self.value = value
+        self.relative_line = relative_line
+        self.symbol_id = symbol_id
+        self.line_origin = line_origin
+
+    @property
+    def line(self):
+        return self.line_origin.line + self.relative_line
+
+    def __reduce__(self):
+        return (Token, (self.TokenType, self.value, self.line, self.symbol_id))
+
+def anchor_lines(nodes, line_origin):
+
+    """
+
+    This function makes the line numbers of newly parsed AST nodes relative to the first line of their statement.
+    The nodes compute their line numbers from the line origin afterwards, see ASTNode.__getattr__.
+
+    Parameters:
+        nodes (list): The AST nodes of a top-level statement.
+        line_origin (LineOrigin): The first line of the statement.
+
+    """
+
+    anchored = set() # The ids of the nodes done, so that one shared by two nodes is changed only once
+    stack = list(nodes) # An explicit stack, so that deep ASTs do not hit the recursion limit
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, ast.ASTNode) and id(node) not in anchored:
+            anchored.add(id(node))
+            attributes = vars(node)
+            for attribute in LINE_ATTRIBUTES: # ASTArrayDecNode keeps its line number as line
+                if type(attributes.get(attribute)) is int:
+                    attributes["relative_" + attribute] = attributes.pop(attribute) - line_origin.line
+            attributes["line_origin"] = line_origin
+            stack.extend(value for value in attributes.values() if isinstance(value, NESTED_TYPES))
+
+class IncrementalParser:
+
+    """
+
+    This class parses successive versions of a program, reusing the AST objects of the top-level statements whose
+    text has not changed since the previous version.
+
+    """
+
+    def __init__(self):
+
+        """
+
+        This function initializes the incremental parser with an empty cache.
+
+        """
+
+        self.lexer = Lexer()
+        self.cache = {} # The line origin and statement nodes of every cached statement, by the hash of its text
+        self.reused = 0 # The number of statements reused by the last parse
+        self.reparsed = 0 # The number of statements parsed by the last parse
+
+    def statement_key(self, token_buffer, first_token, last_token):
+
+        """
+
+        This function returns the hash of the text of the tokens of a statement.
+
+        Parameters:
+            token_buffer (TokenBuffer): The tokens of the program.
+            first_token (int): The index of the first token of the statement.
+            last_token (int): The index one past the last token of the statement.
+
+        Returns:
+            bytes: The hash of the text of the statement.
+
+        """
+
+        text = token_buffer.lexeme(token_buffer.starts[first_token], token_buffer.ends[last_token - 1])
+        return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+    def parse_statement_tokens(self, token_buffer, first_token, last_token):
+
+        """
+
+        This function parses the tokens of one top-level statement, with line numbers relative to its first line.
+
+        Parameters:
+            token_buffer (TokenBuffer): The tokens of the program.
+            first_token (int): The index of the first token of the statement.
+            last_token (int): The index one past the last token of the statement.
+
+        Returns:
+            tuple: The line origin of the statement and the statement nodes parsed from the tokens.
+
+        """
+
+        line_origin = LineOrigin(token_buffer.line(first_token))
+        tokens = [
+            RelativeToken(token_buffer.kind(token_idx), token_buffer.value(token_idx), token_buffer.line(token_idx) - line_origin.line, token_buffer.symbol_id(token_idx), line_origin)
+            for token_idx in range(first_token, last_token)
+        ]
+        tokens.append(RelativeToken(TokenType.EOF, "EOF", tokens[-1].relative_line, None, line_origin))
+        statements = Parser(tokens=tokens).parse_program().statements
+        anchor_lines(statements, line_origin)
+        return line_origin, statements
+
+    def parse(self, src_program_str=None, tokens=None):
+
+        """
+
+        This function parses a version of the program. Statements whose text is in the cache reuse the cached nodes,
+        whose line numbers are moved to where the statements now start, and the cache is replaced by the statements
+        of this version. If a statement cannot be parsed on its own, the
+        whole program is parsed instead and the cache is kept.
+
+        Parameters:
+            src_program_str (str): The source program string, which is lexed if the tokens are not given.
+            tokens (TokenBuffer): The tokens of the program, e.g. from Lexer.relex.
+
+        Returns:
+            ASTProgramNode: The program node, whose statements are reused or new nodes.
+
+        """
+
+        token_buffer = self.lexer.tokenize(src_program_str) if tokens is None else tokens
+        cache = {}
+        program = ast.ASTProgramNode()
+        self.reused = 0
+        self.reparsed = 0
+
+        available = {key: list(entries) for key, entries in self.cache.items()} # The cache itself is kept if the parse fails
+
+        with ast.paused_gc():
+            try:
+                for first_token, last_token in split_statements(token_buffer):
+                    key = self.statement_key(token_buffer, first_token, last_token)
+                    first_line = token_buffer.line(first_token)
+                    entries = available.get(key)
+
+                    if entries: # Reuse the cached nodes, preferring ones that start on the same line
+                        entry = next((entry for entry in entries if entry[0].line == first_line), entries[-1])
+                        entries.remove(entry)
+                        line_origin, statements = entry
+                        line_origin.line = first_line # Moves the line numbers of all the nodes and tokens of the statement
+                        self.reused += 1
+                    else:
+                        line_origin, statements = self.parse_statement_tokens(token_buffer, first_token, last_token)
+                        self.reparsed += 1
+
+                    cache.setdefault(key, []).append((line_origin, statements))
+                    program.statements.extend(statements)
+            except Exception: # Parse the whole program, which raises the same error as Parser.parse_program if there is one
+                program = Parser(src_program_str, token_buffer).parse_program()
+                self.reused = 0
+                self.reparsed = len(program.statements)
+                return program
+
+        self.cache = cache
+        return program
@@ -4,14 +4,42 @@
 Lexer class
 
 """
-from dfa import DFA, input_categories
-from tokens import Token, token_type_by_final_state, TokenType
+from line_index import LineIndex
+from dfa import CHARACTER_CLASSES, DEAD_STATE, character_class, shared_dfa
+from regex_lexer import IGNORED_PATTERN, iter_regex_spans
+import incremental_lexer
+import mapped_lexer
+import numpy_lexer
+import parallel_lexer
+from lexer_generator import load_generated_lexer
+from tokens import InternTable, Token, TokenBuffer, token_kind_by_final_state, token_type_by_final_state, TokenType
+
+# The engines that the lexer can tokenize the input with
+LEXER_ENGINES = ("dfa", "regex", "numpy", "generated")
+
+# The lexer module generated by lexer_generator.py, or None if it is missing or out of date with the DFA
+GENERATED_LEXER = load_generated_lexer()
+
+# The engine that the lexer uses by default, the generated lexer when it is up to date and the DFA otherwise
+DEFAULT_ENGINE = "dfa" if GENERATED_LEXER is None else "generated"
 
 # Lexer Class
 class Lexer:
-    def __init__(self):
-        self.dfa = DFA()
-        self.line_number = 1
+    def __init__(self, use_table_cache=False, engine="auto", error_recovery=False):
+        if engine == "auto":
+            engine = DEFAULT_ENGINE
+        if engine not in LEXER_ENGINES:
+            raise Exception("Unknown lexer engine: " + str(engine))
+        if engine == "numpy" and numpy_lexer.numpy is None:
+            raise Exception("The numpy lexer engine requires NumPy to be installed")
+        if engine == "generated" and GENERATED_LEXER is None:
+            raise Exception("The generated lexer engine requires running lexer_generator.py first")
+        self.engine = engine # The engine used by iter_spans, the DFA engine is the reference for the others
+        self.dfa = shared_dfa(use_table_cache) # The DFA is built once per process and shared by every lexer
+        self.line_index = None # The newline index of the last source program, used to compute line numbers on demand
+        self.intern_table = InternTable() # The names of the identifiers of the compilation and their symbol ids
+        self.error_recovery = error_recovery # Whether invalid lexemes become ERROR tokens instead of raising an exception
+        self.errors = [] # The lexical errors of the last source program lexed with error recovery
             
     def end_of_input(self, src_program_str, src_program_idx):
 
@@ -32,29 +60,70 @@ class Lexer:
         else:
             return False # Return False if the end of the input has not been reached
 
-    def next_char(self, src_program_str, src_program_idx):
+    def get_line_index(self, src_program_str):
 
         """
 
-        Get the next character in the input
+        Get the newline index of the source program string, building it only once per source program
+
+        Parameters:
+            src_program_str (str): The source program string
+
+        Returns:
+            LineIndex: The newline index of the source program string
+
+        """
+
+        if self.line_index is None or self.line_index.src_program is not src_program_str: # Check if the index belongs to another source program
+            self.line_index = LineIndex(src_program_str) # Build the index for this source program
+        return self.line_index
+
+    def match_lexeme(self, src_program_str, src_program_idx, raise_errors=True):
+
+        """
+
+        Run the DFA from the given index and find the longest lexeme that ends in an accepting state
 
         Parameters:
             src_program_str (str): The source program string
             src_program_idx (int): The index of the current character in the source program string
+            raise_errors (bool): Whether to raise an exception if no accepting state is reached
 
         Returns:
-            bool: True if the next character exists, False otherwise
-            str: The next character in the input
+            int: The final state of the DFA for the lexeme, or None if no accepting state is reached and errors are not raised
+            int: The index one past the last character of the lexeme, or the index where the DFA stopped if there is no lexeme
 
         """
 
-        if (not self.end_of_input(src_program_str, src_program_idx)): # Check that the end of the input has not been reached
-            if src_program_str[src_program_idx] == '\n': # Check if the current character is a newline character
-                self.line_number += 1 # Increment the line number
-            return True, src_program_str[src_program_idx] # Return True and the current character
-        else: # If the end of the input has been reached
-            return False, "." # Return False 
-        
+        table = self.dfa.table # The compiled transition matrix of the DFA
+        accepting_bitmap = self.dfa.accepting_bitmap # The bitmap of the accepting states of the DFA
+        num_categories = self.dfa.num_categories # The number of columns of the transition matrix
+        state = self.dfa.start_state.value # Set the state to the start state of the DFA
+        start_idx = src_program_idx # The index of the first character of the lexeme
+        end_of_input_idx = len(src_program_str) # The index one past the last character of the input
+        last_accepting_state = None # The last accepting state reached
+        last_accepting_idx = start_idx # The index one past the last character read in the last accepting state
+
+        while (src_program_idx < end_of_input_idx): # Loop while the end of the input has not been reached
+            character = src_program_str[src_program_idx] # Get the next character in the input
+            code = ord(character) # Get the code point of the character
+            cat = CHARACTER_CLASSES[code] if code < 256 else character_class(character) # Get the category of the character
+            state = table[state * num_categories + cat] # Get the next state based on the current state and category
+            if (state == DEAD_STATE): # Check if an invalid state has been reached
+                break # Break out of the loop
+            src_program_idx = src_program_idx + 1 # Increment the index
+            if accepting_bitmap[state]: # Check if the current state is an accepting state
+                last_accepting_state = state # Remember the accepting state
+                last_accepting_idx = src_program_idx # Remember where the lexeme would end in this state
+
+        if last_accepting_state is None: # Check if no accepting state has been reached
+            if not raise_errors: # Let the caller recover from the invalid lexeme
+                return None, src_program_idx
+            line = self.get_line_index(src_program_str).line(start_idx) # Only compute the line number for the diagnostic
+            raise Exception("Invalid lexeme: " + src_program_str[start_idx:src_program_idx + 1] + " at line " + str(line)) # Raise an exception
+
+        return last_accepting_state, last_accepting_idx # Return the final state and the end of the lexeme
+
     def next_token(self, src_program_str, src_program_idx):
 
         """
@@ -70,51 +139,239 @@ class Lexer:
         
         """
 
-        lexeme = "" # Initialize the lexeme to an empty string
-        state = self.dfa.start_state # Set the state to the start state of the DFA
-        stack = [] # Initialize an empty stack 
-        stack.append(-2) # Push -2 onto the stack
+        final_state, end_idx = self.match_lexeme(src_program_str, src_program_idx) # Find the longest lexeme
+        lexeme = src_program_str[src_program_idx:end_idx] # Slice the lexeme from the input once
+        line = self.get_line_index(src_program_str).line(src_program_idx) # Get the line number of the first character of the lexeme
+        return token_type_by_final_state(final_state, lexeme, line)  # Return the token type based on the final state
+        
+    def skip_whitespace_and_comments(self, src_program_str, src_program_idx):
 
-        while (state != None): # Loop while the state is not None i.e. while an invalid state has not been reached
-            if self.dfa.accepting_states(state):  # Check if the current state is an accepting state
-                stack.clear() # Clear the stack
-            stack.append(state) # Push the current state onto the stack
+        """
 
-            exists, character = self.next_char(src_program_str, src_program_idx) # Get the next character in the input
-            lexeme += character # Append the character to the lexeme
-            if (not exists):  # Check if the character exists
-                break # Break out of the loop
-            src_program_idx = src_program_idx + 1 # Increment the index
+        Skip the whitespace and comments starting at the given index with a single regular expression scan
+        instead of the DFA. An unterminated block comment is not skipped, so that the DFA lexes it exactly as before.
 
-            cat = input_categories(character) # Get the category of the character
-            state = self.dfa.transitions.get((state, cat), None) # Get the next state based on the current state and category
-            if (state == None): # Check if the state is None
-                if character == "\n": # Check if the character is a newline character
-                    self.line_number -= 1 # Decrement the line number
+        Parameters:
+            src_program_str (str): The source program string
+            src_program_idx (int): The index of the current character in the source program string
 
-        lexeme = lexeme[:-1] # Remove the last character from the lexeme
+        Returns:
+            int: The index of the first character that is not part of whitespace or a comment
 
-        syntax_error = False # Initialize the syntax error flag to False
+        """
 
-        while (len(stack) > 0): # Loop while the stack is not empty
-            if (stack[-1] == -2): # Check if the top of the stack is -2
-                syntax_error = True # Set the syntax error flag to True
-                break # Break out of the loop
+        return IGNORED_PATTERN.match(src_program_str, src_program_idx).end()
 
-            if (not self.dfa.accepting_states(stack[-1])): # Check if the top of the stack is not an accepting state
-                stack.pop() # Pop the top of the stack
-                lexeme = lexeme[:-1] # Remove the last character from the lexeme
-            else: # If the top of the stack is an accepting state
-                state = stack.pop() # Pop the top of the stack
-                break # Break out of the loop
+    def iter_spans(self, src_program_str):
+
+        """
+
+        Lazily generate the spans of the tokens in the source program string with the engine of the lexer
+
+        Parameters:
+            src_program_str (str): The source program string
+
+        Returns:
+            generator: The token type, start index and end index of each non-SKIP token, followed by a final EOF span
+
+        """
+
+        if self.error_recovery:
+            return self.iter_recovering_spans(src_program_str)
+        if self.engine == "regex":
+            return iter_regex_spans(self, src_program_str)
+        if self.engine == "numpy":
+            return numpy_lexer.iter_numpy_spans(self, src_program_str)
+        if self.engine == "generated":
+            return GENERATED_LEXER.tokenize(src_program_str)
+        return self.iter_dfa_spans(src_program_str)
+
+    def iter_dfa_spans(self, src_program_str, src_program_idx=0):
+
+        """
+
+        Lazily generate the spans of the tokens in the source program string by running the DFA
+
+        Parameters:
+            src_program_str (str): The source program string
+            src_program_idx (int): The index to start lexing from, which must not be inside a token or comment
+
+        Yields:
+            tuple: The token type, start index and end index of the next non-SKIP token, followed by a final EOF span
+
+        """
+
+        skip_ignored = IGNORED_PATTERN.match # Skips whitespace and comments without materializing SKIP tokens
+        end_of_input_idx = len(src_program_str) # The index one past the last character of the input
+        src_program_idx = skip_ignored(src_program_str, src_program_idx).end() # Skip any leading whitespace and comments
+
+        while (src_program_idx < end_of_input_idx): # Loop until the end of the input has been reached
+            final_state, end_idx = self.match_lexeme(src_program_str, src_program_idx) # Find the longest lexeme
+            token_type = token_kind_by_final_state(final_state, src_program_str[src_program_idx:end_idx]) # Get the token type of the lexeme
+            if token_type != TokenType.SKIP: # Check if the token type is not SKIP
+                yield token_type, src_program_idx, end_idx # Yield the span if the token type is not SKIP
+            src_program_idx = skip_ignored(src_program_str, end_idx).end() # Move the index past the token and what follows it
+
+        yield TokenType.EOF, src_program_idx, src_program_idx
+
+    def iter_recovering_spans(self, src_program_str):
+
+        """
+
+        Lazily generate the spans of the tokens in the source program string by running the DFA, turning every invalid
+        lexeme into an ERROR token and recording its error instead of raising an exception, so that all the lexical
+        errors of the source program are found in one pass
+
+        Parameters:
+            src_program_str (str): The source program string
+
+        Yields:
+            tuple: The token type, start index and end index of the next non-SKIP token, followed by a final EOF span
+
+        """
+
+        self.errors = [] # Collect the errors of this source program only
+        skip_ignored = IGNORED_PATTERN.match # Skips whitespace and comments without materializing SKIP tokens
+        end_of_input_idx = len(src_program_str) # The index one past the last character of the input
+        src_program_idx = skip_ignored(src_program_str, 0).end() # Skip any leading whitespace and comments
+        error_start_idx = None # The index of the first character of the invalid input that is being skipped
+
+        while (src_program_idx < end_of_input_idx): # Loop until the end of the input has been reached
+            final_state, end_idx = self.match_lexeme(src_program_str, src_program_idx, raise_errors=False) # Find the longest lexeme
+            if final_state is None: # The DFA has not reached an accepting state
+                token_type = TokenType.ERROR
+                error = "Invalid lexeme: " + src_program_str[src_program_idx:end_idx + 1] + " at line " + str(self.get_line_index(src_program_str).line(src_program_idx))
+                end_idx = max(end_idx, src_program_idx + 1) # Skip the characters that the DFA has read, and at least one
+            else:
+                try:
+                    token_type = token_kind_by_final_state(final_state, src_program_str[src_program_idx:end_idx]) # Get the token type of the lexeme
+                except Exception as exception: # The lexeme has no token type, e.g. an unknown special function
+                    token_type = TokenType.ERROR
+                    error = str(exception) + " at line " + str(self.get_line_index(src_program_str).line(src_program_idx))
+
+            if token_type == TokenType.ERROR:
+                if error_start_idx is None: # Adjacent invalid lexemes are reported as a single error
+                    error_start_idx = src_program_idx
+                    self.errors.append(error)
+                src_program_idx = end_idx
+                if src_program_idx < end_of_input_idx and skip_ignored(src_program_str, src_program_idx).end() == src_program_idx:
+                    continue # The next lexeme follows directly and may be invalid as well
+                yield TokenType.ERROR, error_start_idx, src_program_idx
+                error_start_idx = None
+                src_program_idx = skip_ignored(src_program_str, src_program_idx).end()
+                continue
+
+            if error_start_idx is not None: # A valid lexeme ends the invalid input before it
+                yield TokenType.ERROR, error_start_idx, src_program_idx
+                error_start_idx = None
+            if token_type != TokenType.SKIP: # Check if the token type is not SKIP
+                yield token_type, src_program_idx, end_idx # Yield the span if the token type is not SKIP
+            src_program_idx = skip_ignored(src_program_str, end_idx).end() # Move the index past the token and what follows it
+
+        yield TokenType.EOF, src_program_idx, src_program_idx
+
+    def iter_tokens(self, src_program_str):
+
+        """
+
+        Lazily generate tokens from the source program string
+
+        Parameters:
+            src_program_str (str): The source program string
+
+        Yields:
+            Token: The next non-SKIP token in the source program string, followed by a final EOF token
+
+        """
+
+        line_index = self.get_line_index(src_program_str)
+        intern_table = self.intern_table
+        for token_type, start_idx, end_idx in self.iter_spans(src_program_str):
+            if token_type == TokenType.IDENTIFIER: # Every occurrence of a name shares one string object and symbol id
+                symbol_id = intern_table.intern(src_program_str[start_idx:end_idx])
+                yield Token(token_type, intern_table.names[symbol_id], line_index.line(start_idx), symbol_id)
+            elif token_type == TokenType.EOF:
+                yield Token(token_type, "EOF", line_index.line(start_idx))
+            else:
+                yield Token(token_type, src_program_str[start_idx:end_idx], line_index.line(start_idx))
+
+    def tokenize(self, src_program_str):
+
+        """
+
+        Generate a compact token buffer from the source program string
+
+        Parameters:
+            src_program_str (str): The source program string
+
+        Returns:
+            TokenBuffer: The tokens generated from the source program string, stored as parallel arrays
+
+        """
+
+        token_buffer = TokenBuffer(src_program_str, self.get_line_index(src_program_str), self.intern_table)
+        for token_type, start_idx, end_idx in self.iter_spans(src_program_str):
+            token_buffer.append(token_type, start_idx, end_idx)
+        return token_buffer
+
+    def from_path(self, path):
+
+        """
+
+        Generate a compact token buffer from a source file, lexing ASCII files directly from the memory-mapped bytes.
+        The memory-mapped bytes are lexed with byte versions of the regular expressions and without error recovery,
+        so a lexer that recovers from errors or that was given an engine other than the default one reads the file
+        into a string and lexes it with its own engine instead
+
+        Parameters:
+            path (str): The path of the source file
+
+        Returns:
+            TokenBuffer: The tokens generated from the source file
+
+        """
+
+        if self.error_recovery or self.engine != DEFAULT_ENGINE:
+            return mapped_lexer.tokenize_text(self, path)
+        return mapped_lexer.tokenize_path(self, path)
+
+    def tokenize_parallel(self, src_program_str, max_workers=None):
+
+        """
+
+        Generate a compact token buffer from the source program string, lexing chunks of it in parallel processes
+
+        Parameters:
+            src_program_str (str): The source program string
+            max_workers (int): The number of worker processes, by default the number of CPUs
+
+        Returns:
+            TokenBuffer: The tokens generated from the source program string, the same as the ones of tokenize
+
+        """
+
+        return parallel_lexer.tokenize_parallel(self, src_program_str, max_workers)
+
+    def relex(self, token_buffer, edit_offset, deleted_length, inserted_text):
+
+        """
+
+        Update the tokens of a source program after an edit, re-lexing only the tokens around the edit
+
+        Parameters:
+            token_buffer (TokenBuffer): The tokens of the source program before the edit
+            edit_offset (int): The index in the source program where the edit starts
+            deleted_length (int): The number of characters deleted at the edit offset
+            inserted_text (str): The text inserted at the edit offset
+
+        Returns:
+            TokenBuffer: The tokens of the edited source program
+            tuple: The range of tokens that changed, see incremental_lexer.relex
+
+        """
+
+        return incremental_lexer.relex(self, token_buffer, edit_offset, deleted_length, inserted_text)
 
-        if syntax_error: # Check if there is a syntax error
-            raise Exception("Invalid lexeme: " + lexeme + " at line " + str(self.line_number)) # Raise an exception
-        if self.dfa.accepting_states(state): # Check if the state is an accepting state
-            return token_type_by_final_state(state.value, lexeme, self.line_number)  # Return the token type based on the final state
-        else: # If the state is not an accepting state
-            raise Exception("Invalid lexeme: " + lexeme + " at line " + str(self.line_number)) # Raise an exception
-        
     def generate_tokens(self, src_program_str):
         
         """
@@ -129,21 +386,7 @@ class Lexer:
         
         """
 
-        tokens_list = [] # Initialize an empty list to store the tokens
-        src_program_idx = 0 # Initialize the index to 0
-        token = self.next_token(src_program_str, src_program_idx) # Get the next token
-
-        while (token.TokenType != TokenType.EOF): # Loop while the token type is not EOF
-            if token.TokenType != TokenType.SKIP: # Check if the token type is not SKIP
-                tokens_list.append(token) # Append the token to the list if the token type is not SKIP
-            src_program_idx = src_program_idx + len(token.value) # Increment the index by the length of the token value
-            if (not self.end_of_input(src_program_str, src_program_idx)): # Check if the end of the input has not been reached
-                token = self.next_token(src_program_str, src_program_idx) # Get the next token if the end of the input has not been reached
-            else: # If the end of the input has been reached
-                token = Token(TokenType.EOF, "EOF", self.line_number) # Set the token type to EOF
-
-        tokens_list.append(token)   
-        return tokens_list # Return the list of tokens
+        return list(self.iter_tokens(src_program_str)) # Return the list of tokens
     
 # Test the Lexer
 if __name__ == "__main__":
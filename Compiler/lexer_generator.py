@@ -0,0 +1,365 @@
+"""
+
+This file contains the build step that generates a specialized lexer module from the DFA specification.
+The transitions of the DFA in dfa.py and the token types of its final states in tokens.py are turned into a
+tokenize function with the states inlined as nested if branches on local integer variables, so that the
+generated lexer does not index the transition table or look up token types while it runs.
+
+The lexer uses the generated module automatically when it exists and its checksum matches the files it
+was generated from.
+
+Usage: python Compiler/lexer_generator.py
+
+"""
+
+import hashlib
+import importlib
+import os
+from dfa import CATEGORIES, CATEGORY_INDEX, CHARACTER_CLASSES, DFA
+from regex_lexer import IGNORED_PATTERN
+from tokens import FINAL_STATE_LEXEME_TOKEN_TYPES, FINAL_STATE_TOKEN_TYPES, IDENTIFIER_FINAL_STATE, KEYWORDS, TokenType
+
+COMPILER_PATH = os.path.dirname(os.path.abspath(__file__))
+
+# The name and path of the generated lexer module
+GENERATED_LEXER_MODULE = "generated_lexer"
+GENERATED_LEXER_PATH = os.path.join(COMPILER_PATH, GENERATED_LEXER_MODULE + ".py")
+
+# The files that the generated lexer is derived from
+SOURCE_PATHS = [os.path.join(COMPILER_PATH, name) for name in ("dfa.py", "tokens.py", "regex_lexer.py", "lexer_generator.py")]
+
+# Lexeme maps with at most this many entries are inlined as string comparisons instead of a dictionary
+MAX_INLINED_LEXEMES = 4
+
+def source_checksum():
+
+    """
+
+    This function returns a checksum of the files that the generated lexer is derived from.
+
+    Returns:
+        str: The checksum of the source files.
+
+    """
+
+    digest = hashlib.sha256()
+    for path in SOURCE_PATHS:
+        with open(path, 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+def strongly_connected_states(transitions, states):
+
+    """
+
+    This function groups the states of the DFA that can reach each other, ignoring self loops.
+
+    Parameters:
+        transitions (dict): The target state of every category, for every state.
+        states (list): The states of the DFA.
+
+    Returns:
+        dict: The states that each state can reach and be reached from, including itself.
+
+    """
+
+    reachable = {}
+    for state in states:
+        seen = set()
+        pending = [state]
+        while pending:
+            for target in transitions.get(pending.pop(), {}).values():
+                if target not in seen:
+                    seen.add(target)
+                    pending.append(target)
+        reachable[state] = seen
+
+    return {state: frozenset([state] + [other for other in reachable[state] if state in reachable[other]]) for state in states}
+
+class LexerGenerator:
+
+    """
+
+    This class generates the source of the specialized lexer module.
+
+    """
+
+    def __init__(self):
+        dfa = DFA()
+        self.lines = []
+        self.start_state = dfa.start_state.value
+        self.accepting = set(state.value for state in dfa.final_states)
+        self.transitions = {}
+        for (state, category), target in dfa.transitions.items():
+            self.transitions.setdefault(state.value, {})[CATEGORY_INDEX[category]] = target.value
+        self.components = strongly_connected_states(self.transitions, [state.value for state in dfa.states])
+
+    def emit(self, indent, line):
+        self.lines.append("    " * indent + line)
+
+    def categories_condition(self, categories):
+
+        """
+
+        This function returns the condition that checks if the category k is one of the given categories.
+
+        """
+
+        categories = sorted(categories)
+        names = ", ".join(CATEGORIES[category] for category in categories)
+        if len(categories) == 1:
+            return "k == " + str(categories[0]) + ": # " + names
+        return "k in (" + ", ".join(str(category) for category in categories) + "): # " + names
+
+    def emit_next_category(self, indent):
+        self.emit(indent, "c = src[i]")
+        self.emit(indent, "o = ord(c)")
+        self.emit(indent, "k = CHARACTER_CLASSES[o] if o < 256 else (DIGIT if c.isdigit() else LETTER if c.isalpha() else OTHER)")
+
+    def targets_by_state(self, state):
+
+        """
+
+        This function groups the categories of the transitions that leave the given state by their target.
+
+        """
+
+        targets = {}
+        for category, target in self.transitions.get(state, {}).items():
+            targets.setdefault(target, []).append(category)
+        return targets
+
+    def emit_state(self, state, indent):
+
+        """
+
+        This function emits the code that runs after the DFA has entered the given state, with i the index of the
+        next character. Every path of the emitted code returns the final state and the end of the longest lexeme.
+
+        """
+
+        if len(self.components[state]) > 1:
+            self.emit_component(state, indent)
+            return
+
+        targets = self.targets_by_state(state)
+        self_categories = targets.pop(state, None)
+        accepting = state in self.accepting
+        stop = "return " + str(state) + ", i" if accepting else "return last_state, (last_idx if last_state >= 0 else i)"
+
+        self.emit(indent, "# S_" + str(state))
+        if self_categories is not None:
+            self.emit(indent, "while i < n:")
+            self.emit_next_category(indent + 1)
+            self.emit(indent + 1, "if " + self.categories_condition(self_categories))
+            self.emit(indent + 2, "i += 1")
+            self.emit(indent + 2, "continue")
+            self.emit_branches(state, targets, indent + 1, "if ")
+            self.emit(indent + 1, "break")
+        elif targets:
+            self.emit(indent, "if i < n:")
+            self.emit_next_category(indent + 1)
+            self.emit_branches(state, targets, indent + 1, "if ")
+        self.emit(indent, stop)
+
+    def emit_branches(self, state, targets, indent, keyword):
+
+        """
+
+        This function emits one branch per target of the given state, each of which consumes the character and
+        continues in the target state.
+
+        """
+
+        for target, categories in sorted(targets.items()):
+            self.emit(indent, keyword + self.categories_condition(categories))
+            if state in self.accepting: # Remember the lexeme of this state in case the DFA gets stuck later
+                self.emit(indent + 1, "last_state = " + str(state))
+                self.emit(indent + 1, "last_idx = i")
+            self.emit(indent + 1, "i += 1")
+            self.emit_state(target, indent + 1)
+            keyword = "elif "
+
+    def emit_component(self, entry, indent):
+
+        """
+
+        This function emits a loop over a state variable for a group of states that can reach each other.
+
+        """
+
+        component = self.components[entry]
+        self.emit(indent, "# S_" + ", S_".join(str(state) for state in sorted(component)))
+        if entry in self.accepting:
+            self.emit(indent, "last_state = " + str(entry))
+            self.emit(indent, "last_idx = i")
+        self.emit(indent, "state = " + str(entry))
+        self.emit(indent, "while i < n:")
+        self.emit_next_category(indent + 1)
+
+        keyword = "if "
+        for state in sorted(component):
+            self.emit(indent + 1, keyword + "state == " + str(state) + ":")
+            keyword = "elif "
+            inner_keyword = "if "
+            for target, categories in sorted(self.targets_by_state(state).items()):
+                self.emit(indent + 2, inner_keyword + self.categories_condition(categories))
+                inner_keyword = "elif "
+                self.emit(indent + 3, "i += 1")
+                if target in component:
+                    if target != state:
+                        self.emit(indent + 3, "state = " + str(target))
+                    if target in self.accepting:
+                        self.emit(indent + 3, "last_state = " + str(target))
+                        self.emit(indent + 3, "last_idx = i")
+                    self.emit(indent + 3, "continue")
+                else:
+                    self.emit_state(target, indent + 3)
+        self.emit(indent + 1, "break")
+        self.emit(indent, "return last_state, (last_idx if last_state >= 0 else i)")
+
+    def emit_classification(self, indent):
+
+        """
+
+        This function emits the code that turns the final state and the lexeme into a token type.
+
+        """
+
+        final_states = [IDENTIFIER_FINAL_STATE] + sorted(state for state in self.accepting if state != IDENTIFIER_FINAL_STATE)
+        keyword = "if "
+        for state in final_states:
+            self.emit(indent, keyword + "final_state == " + str(state) + ":")
+            keyword = "elif "
+            if state == IDENTIFIER_FINAL_STATE:
+                self.emit(indent + 1, "token_type = KEYWORDS.get(src[i:end_idx], IDENTIFIER)")
+            elif state in FINAL_STATE_TOKEN_TYPES:
+                if FINAL_STATE_TOKEN_TYPES[state] == TokenType.SKIP:
+                    self.emit(indent + 1, "i = skip_ignored(src, end_idx).end()")
+                    self.emit(indent + 1, "continue")
+                    continue
+                self.emit(indent + 1, "token_type = " + FINAL_STATE_TOKEN_TYPES[state].name)
+            elif state in FINAL_STATE_LEXEME_TOKEN_TYPES and len(FINAL_STATE_LEXEME_TOKEN_TYPES[state]) <= MAX_INLINED_LEXEMES:
+                self.emit(indent + 1, "lexeme = src[i:end_idx]")
+                lexeme_keyword = "if "
+                for lexeme, token_type in FINAL_STATE_LEXEME_TOKEN_TYPES[state].items():
+                    self.emit(indent + 1, lexeme_keyword + "lexeme == " + repr(lexeme) + ":")
+                    self.emit(indent + 2, "token_type = " + token_type.name)
+                    lexeme_keyword = "elif "
+                self.emit(indent + 1, "else:")
+                self.emit(indent + 2, "raise Exception(\"Invalid token: \" + lexeme)")
+            elif state in FINAL_STATE_LEXEME_TOKEN_TYPES:
+                self.emit(indent + 1, "lexeme = src[i:end_idx]")
+                self.emit(indent + 1, "token_type = LEXEMES_" + str(state) + ".get(lexeme)")
+                self.emit(indent + 1, "if token_type is None:")
+                self.emit(indent + 2, "raise Exception(\"Invalid token: \" + lexeme)")
+            else:
+                self.emit(indent + 1, "raise Exception(\"Invalid token: \" + src[i:end_idx])")
+        self.emit(indent, "else:")
+        self.emit(indent + 1, "raise Exception(\"Invalid lexeme: \" + src[i:end_idx + 1] + \" at line \" + str(src.count(\"\\n\", 0, i) + 1))")
+
+    def generate(self):
+
+        """
+
+        This function generates the source of the specialized lexer module.
+
+        Returns:
+            str: The source of the module.
+
+        """
+
+        self.lines = []
+        self.emit(0, '"""')
+        self.emit(0, "")
+        self.emit(0, "This file was generated by lexer_generator.py from dfa.py and tokens.py. Do not edit it,")
+        self.emit(0, "run python Compiler/lexer_generator.py after changing the DFA instead.")
+        self.emit(0, "")
+        self.emit(0, '"""')
+        self.emit(0, "")
+        self.emit(0, "import re")
+        self.emit(0, "from tokens import TokenType")
+        self.emit(0, "")
+        self.emit(0, "SOURCE_CHECKSUM = " + repr(source_checksum()))
+        self.emit(0, "")
+        self.emit(0, "CHARACTER_CLASSES = " + repr(CHARACTER_CLASSES))
+        self.emit(0, "DIGIT = " + str(CATEGORY_INDEX['digit']))
+        self.emit(0, "LETTER = " + str(CATEGORY_INDEX['letter']))
+        self.emit(0, "OTHER = " + str(CATEGORY_INDEX['other']))
+        self.emit(0, "")
+        self.emit(0, "IGNORED_PATTERN = re.compile(" + repr(IGNORED_PATTERN.pattern) + ", " + str(int(IGNORED_PATTERN.flags)) + ")")
+        self.emit(0, "")
+        token_types = set(FINAL_STATE_TOKEN_TYPES.values()) | set(KEYWORDS.values()) | {TokenType.IDENTIFIER, TokenType.EOF}
+        for lexeme_token_types in FINAL_STATE_LEXEME_TOKEN_TYPES.values():
+            token_types |= set(lexeme_token_types.values())
+        for token_type in sorted(token_types, key=lambda token_type: token_type.value):
+            self.emit(0, token_type.name + " = TokenType." + token_type.name)
+        self.emit(0, "")
+        self.emit(0, "KEYWORDS = {" + ", ".join(repr(lexeme) + ": " + token_type.name for lexeme, token_type in KEYWORDS.items()) + "}")
+        for state, lexeme_token_types in sorted(FINAL_STATE_LEXEME_TOKEN_TYPES.items()):
+            if len(lexeme_token_types) > MAX_INLINED_LEXEMES:
+                self.emit(0, "LEXEMES_" + str(state) + " = {" + ", ".join(repr(lexeme) + ": " + token_type.name for lexeme, token_type in lexeme_token_types.items()) + "}")
+        self.emit(0, "")
+
+        self.emit(0, "def match_lexeme(src, i, n):")
+        self.emit(1, '"""Return the final state of the longest lexeme starting at i and the index one past its end, or -1 and the index where the DFA got stuck."""')
+        self.emit(1, "last_state = -1")
+        self.emit(1, "last_idx = i")
+        self.emit_state(self.start_state, 1)
+        self.emit(0, "")
+
+        self.emit(0, "def tokenize(src):")
+        self.emit(1, '"""Lazily generate the token type, start index and end index of every non-SKIP token, followed by EOF."""')
+        self.emit(1, "skip_ignored = IGNORED_PATTERN.match")
+        self.emit(1, "n = len(src)")
+        self.emit(1, "i = skip_ignored(src, 0).end()")
+        self.emit(1, "while i < n:")
+        self.emit(2, "final_state, end_idx = match_lexeme(src, i, n)")
+        self.emit_classification(2)
+        self.emit(2, "yield token_type, i, end_idx")
+        self.emit(2, "i = skip_ignored(src, end_idx).end()")
+        self.emit(1, "yield EOF, i, i")
+
+        return "\n".join(self.lines) + "\n"
+
+def write_generated_lexer(path=GENERATED_LEXER_PATH):
+
+    """
+
+    This function generates the specialized lexer module and writes it to the given path.
+
+    Parameters:
+        path (str): The path of the generated module.
+
+    """
+
+    source = LexerGenerator().generate()
+    temporary_path = path + "." + str(os.getpid()) # Write to a temporary file so that a lexer never imports a partial module
+    with open(temporary_path, 'w') as file:
+        file.write(source)
+    os.replace(temporary_path, path)
+
+def load_generated_lexer():
+
+    """
+
+    This function imports the generated lexer module if it exists and was generated from the current source files.
+
+    Returns:
+        module: The generated lexer module, or None if it is missing or out of date.
+
+    """
+
+    if not os.path.exists(GENERATED_LEXER_PATH):
+        return None
+    try:
+        generated_lexer = importlib.import_module(GENERATED_LEXER_MODULE)
+    except (ImportError, SyntaxError):
+        return None
+    if getattr(generated_lexer, "SOURCE_CHECKSUM", None) != source_checksum():
+        return None
+    return generated_lexer
+
+if __name__ == "__main__":
+    write_generated_lexer()
+    print("Wrote " + GENERATED_LEXER_PATH)
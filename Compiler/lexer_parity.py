@@ -0,0 +1,147 @@
+"""
+
+This file contains a differential test harness for the lexer engines. It lexes the programs in Examples/ and
+randomly generated programs with every engine and reports any program for which an engine produces different
+tokens, values, line numbers or errors than the DFA engine, which is the reference.
+
+Usage: python Compiler/lexer_parity.py [number of random programs] [seed]
+
+"""
+
+import glob
+import os
+import random
+import re
+import sys
+import numpy_lexer
+from lexer import GENERATED_LEXER, Lexer, LEXER_ENGINES
+
+# The engines that can run in this environment, the numpy engine needs the optional NumPy dependency
+# and the generated engine needs an up to date module from lexer_generator.py
+AVAILABLE_ENGINES = tuple(engine for engine in LEXER_ENGINES if (engine != "numpy" or numpy_lexer.numpy is not None) and (engine != "generated" or GENERATED_LEXER is not None))
+
+EXAMPLES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Examples")
+
+# The pieces that random programs are built from, covering every token type, whitespace, comments and non-ASCII input
+PROGRAM_PIECES = [
+    "let", "x", "y1", "foo_bar", "deadBEEF", "abc", "__print", "__write", "__write_box", "__width", "__height",
+    "__read", "__random_int", "__delay", "as", "int", "float", "bool", "colour", "return", "if", "else", "for",
+    "while", "fun", "true", "false", "and", "or", "not", "0", "12", "3.14", "#a1b2c3", "#FFFFFF", "+", "-", "*",
+    "/", "->", "=", "==", "!=", "<", ">", "<=", ">=", "(", ")", "{", "}", "[", "]", ",", ";", ":", " ", "\t", "\n",
+    "// line comment\n", "/* block */", "/* multi\nline ** / */", "/**/", "/***/", "é", "ü2", "²", "//",
+]
+
+# Pieces that make the lexer raise an error or take unusual paths, only added to some of the random programs
+INVALID_PIECES = ["!", "__foo", "#12", ".", "_", "__", "\"", "$", "\r\n", "1.", "/* unterminated", "1.²"]
+
+def random_program(rng, length):
+
+    """
+
+    This function builds a random program from the program pieces. The program is lexically, but not
+    necessarily syntactically, valid unless an invalid piece is added.
+
+    Parameters:
+        rng (random.Random): The random number generator.
+        length (int): The number of pieces in the program.
+
+    Returns:
+        str: The random program.
+
+    """
+
+    pieces = [rng.choice(PROGRAM_PIECES) + rng.choice(["", " ", "\n"]) for _ in range(length)]
+    if rng.random() < 0.2:
+        pieces.insert(rng.randint(0, length), rng.choice(INVALID_PIECES))
+    return ("" if rng.random() < 0.25 else " ").join(pieces)
+
+def example_programs():
+
+    """
+
+    This function returns the PArL programs in Examples/, without the PArIR code that follows them.
+
+    Returns:
+        list: The names and source strings of the example programs.
+
+    """
+
+    programs = []
+    for path in sorted(glob.glob(os.path.join(EXAMPLES_PATH, "*.txt"))):
+        with open(path, "r") as file:
+            src_program_str = file.read()
+        src_program_str = re.split(r"PArIR [Cc]ode:", src_program_str)[0]
+        src_program_str = re.sub(r"PArL [Cc]ode:", "", src_program_str)
+        programs.append((os.path.basename(path), src_program_str))
+    return programs
+
+def lex_with_engine(engine, src_program_str):
+
+    """
+
+    This function lexes a program with the given engine.
+
+    Parameters:
+        engine (str): The lexer engine.
+        src_program_str (str): The source program string.
+
+    Returns:
+        list: The token type, value and line of every token, or the error message if the lexer raised an error.
+
+    """
+
+    try:
+        return [(token.TokenType, token.value, token.line) for token in Lexer(engine=engine).iter_tokens(src_program_str)]
+    except Exception as error:
+        return "error: " + str(error)
+
+def compare_engines(src_program_str, engines=AVAILABLE_ENGINES):
+
+    """
+
+    This function lexes a program with every engine and compares the output with the DFA engine.
+
+    Parameters:
+        src_program_str (str): The source program string.
+        engines (tuple): The engines to compare.
+
+    Returns:
+        list: The engines whose output differs from the DFA engine.
+
+    """
+
+    reference = lex_with_engine("dfa", src_program_str)
+    return [engine for engine in engines if lex_with_engine(engine, src_program_str) != reference]
+
+def main(count=500, seed=0):
+
+    """
+
+    This function runs every engine over the example programs and the random programs and prints the mismatches.
+
+    Parameters:
+        count (int): The number of random programs.
+        seed (int): The seed of the random number generator.
+
+    Returns:
+        int: The number of programs for which the engines disagree.
+
+    """
+
+    rng = random.Random(seed)
+    programs = example_programs()
+    programs += [("random program " + str(index), random_program(rng, rng.randint(1, 80))) for index in range(count)]
+
+    mismatches = 0
+    for name, src_program_str in programs:
+        engines = compare_engines(src_program_str)
+        if engines:
+            mismatches += 1
+            print("Mismatch in " + name + " for engines " + ", ".join(engines) + ": " + repr(src_program_str))
+
+    print("Compared " + str(len(programs)) + " programs with engines " + ", ".join(AVAILABLE_ENGINES) + ": " + str(mismatches) + " mismatches")
+    return mismatches
+
+if __name__ == "__main__":
+    arguments = [int(argument) for argument in sys.argv[1:3]]
+    sys.exit(1 if main(*arguments) else 0)
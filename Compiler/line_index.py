@@ -0,0 +1,122 @@
+"""
+
+This file contains functionality related to turning indices in the source program into line and column numbers.
+
+"""
+
+from array import array
+from bisect import bisect_left
+
+class LineIndex:
+
+    """
+
+    This class stores the index of every newline character in a source program, so that the line and column
+    of any index can be found with a binary search instead of counting newlines while lexing.
+
+    """
+
+    def __init__(self, src_program_str, newline_offsets=None):
+
+        """
+
+        This function builds the newline index of the source program.
+
+        Parameters:
+            src_program_str (str): The source program string.
+            newline_offsets (array): The index of every newline character, if it is already known.
+
+        """
+
+        self.src_program = src_program_str
+        self.newline_offsets = newline_offsets # The index of every newline character, in increasing order
+
+        if newline_offsets is not None:
+            return
+
+        self.newline_offsets = array('I')
+        newline_idx = src_program_str.find("\n")
+        while newline_idx != -1:
+            self.newline_offsets.append(newline_idx)
+            newline_idx = src_program_str.find("\n", newline_idx + 1)
+
+    def line(self, src_program_idx):
+
+        """
+
+        This function returns the line number of the character at the given index.
+
+        Parameters:
+            src_program_idx (int): The index of the character in the source program string.
+
+        Returns:
+            int: The line number of the character, starting from 1.
+
+        """
+
+        return bisect_left(self.newline_offsets, src_program_idx) + 1 # One more than the number of newlines before the index
+
+    def column(self, src_program_idx):
+
+        """
+
+        This function returns the column number of the character at the given index.
+
+        Parameters:
+            src_program_idx (int): The index of the character in the source program string.
+
+        Returns:
+            int: The column number of the character, starting from 1.
+
+        """
+
+        line = self.line(src_program_idx)
+        if line == 1:
+            return src_program_idx + 1
+        return src_program_idx - self.newline_offsets[line - 2]
+
+    def position(self, src_program_idx):
+
+        """
+
+        This function returns the line and column numbers of the character at the given index.
+
+        Parameters:
+            src_program_idx (int): The index of the character in the source program string.
+
+        Returns:
+            tuple: The line and column numbers of the character.
+
+        """
+
+        return self.line(src_program_idx), self.column(src_program_idx)
+
+    def edit(self, src_program_str, edit_offset, deleted_length, inserted_text):
+
+        """
+
+        This function returns the newline index of the source program after an edit, reusing the newlines
+        before the edit and shifting the ones after it instead of searching the whole program again.
+
+        Parameters:
+            src_program_str (str): The source program string after the edit.
+            edit_offset (int): The index where the edit starts.
+            deleted_length (int): The number of characters deleted at the edit offset.
+            inserted_text (str): The text inserted at the edit offset.
+
+        Returns:
+            LineIndex: The newline index of the edited source program.
+
+        """
+
+        shift = len(inserted_text) - deleted_length
+        newline_offsets = self.newline_offsets[:bisect_left(self.newline_offsets, edit_offset)]
+
+        newline_idx = inserted_text.find("\n")
+        while newline_idx != -1:
+            newline_offsets.append(edit_offset + newline_idx)
+            newline_idx = inserted_text.find("\n", newline_idx + 1)
+
+        following_newlines = self.newline_offsets[bisect_left(self.newline_offsets, edit_offset + deleted_length):]
+        newline_offsets.extend(map(shift.__add__, following_newlines))
+        return LineIndex(src_program_str, newline_offsets)
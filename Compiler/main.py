@@ -1,24 +1,12 @@
-from lexer import *
-from parser_ import *
-from semantic_analysis_visitor import * 
-from code_generation_visitor import *
+import sys
+import ast_cache
+from pipeline import compile_source
 
 task_1_1_path = 'Examples/test.txt' 
 with open(task_1_1_path, 'r') as file:
     src_program_str = file.read()
 
-# Lexer 
-lexer = Lexer()
-tokens = lexer.generate_tokens(src_program_str)
-for token in tokens:
-    print(token.TokenType, token.value, token.line)
-
-# Parser
-parser = Parser(src_program_str)
-program_ast = parser.parse_program()
-
-# Semantic Analysis
-program_ast.accept(SemanticAnalysisVisitor())
-
-# Code Generation
-program_ast.accept(CodeGenerationVisitor("output.txt"))
\ No newline at end of file
+# Lexer, Parser, Semantic Analysis and Code Generation, lexing the program only once and
+# loading its AST from the AST cache if the program has not changed since it was last compiled.
+# The tokens are only printed with --tokens, since printing them means lexing the program even on a cache hit
+compile_source(src_program_str, "output.txt", print_tokens="--tokens" in sys.argv, cache_dir=ast_cache.CACHE_DIR)
@@ -0,0 +1,158 @@
+"""
+
+This file contains the lexing of source files that are memory-mapped instead of read into a string. ASCII files
+are lexed directly from the mapped bytes with byte versions of the patterns of the regular expression engine, so
+that the file is neither decoded nor copied as a whole. Only the lexemes whose token type depends on their text
+are decoded while lexing, and the lexemes of the tokens are decoded when they are requested.
+
+"""
+
+import mmap
+import re
+from array import array
+from line_index import LineIndex
+from regex_lexer import GROUP_FINAL_STATES, IGNORED_PATTERN, MASTER_PATTERN
+from tokens import FINAL_STATE_TOKEN_TYPES, TokenBuffer, token_kind_by_final_state, TokenType
+
+# The patterns of the regular expression engine, matching the same lexemes in ASCII bytes
+BYTES_IGNORED_PATTERN = re.compile(IGNORED_PATTERN.pattern.encode("ascii"), IGNORED_PATTERN.flags & ~re.UNICODE)
+BYTES_MASTER_PATTERN = re.compile(MASTER_PATTERN.pattern.encode("ascii"), MASTER_PATTERN.flags & ~re.UNICODE)
+
+# Matches any byte that is not ASCII
+NON_ASCII_PATTERN = re.compile(rb"[^\x00-\x7f]")
+
+class MappedTokenBuffer(TokenBuffer):
+
+    """
+
+    This class stores the tokens of a memory-mapped ASCII source file, decoding the lexemes only when they are requested.
+
+    """
+
+    def lexeme(self, start, end):
+
+        """
+
+        This function decodes the text of the source file between two indices.
+
+        Parameters:
+            start (int): The index of the first character of the lexeme.
+            end (int): The index one past the last character of the lexeme.
+
+        Returns:
+            str: The lexeme.
+
+        """
+
+        return self.src_program[start:end].decode("ascii")
+
+def bytes_line_index(src_program_bytes):
+
+    """
+
+    This function builds the newline index of a source program that is stored as bytes.
+
+    Parameters:
+        src_program_bytes (mmap.mmap): The source program bytes.
+
+    Returns:
+        LineIndex: The newline index of the source program.
+
+    """
+
+    newline_offsets = array('I')
+    newline_idx = src_program_bytes.find(b"\n")
+    while newline_idx != -1:
+        newline_offsets.append(newline_idx)
+        newline_idx = src_program_bytes.find(b"\n", newline_idx + 1)
+    return LineIndex(src_program_bytes, newline_offsets)
+
+def iter_bytes_spans(lexer, src_program_bytes):
+
+    """
+
+    This function lazily generates the spans of the tokens in an ASCII source program that is stored as bytes.
+    The master pattern matches every valid ASCII lexeme, so the source program is only decoded for the DFA of the
+    lexer when a lexeme does not match, so that the DFA raises the same error as for the string.
+
+    Parameters:
+        lexer (Lexer): The lexer whose DFA reports invalid lexemes.
+        src_program_bytes (mmap.mmap): The source program bytes, which must only contain ASCII characters.
+
+    Yields:
+        tuple: The token type, start index and end index of the next non-SKIP token, followed by a final EOF span.
+
+    """
+
+    skip_ignored = BYTES_IGNORED_PATTERN.match
+    match_lexeme = BYTES_MASTER_PATTERN.match
+    group_final_states = GROUP_FINAL_STATES
+    final_state_token_types = FINAL_STATE_TOKEN_TYPES
+    end_of_input_idx = len(src_program_bytes)
+    src_program_idx = skip_ignored(src_program_bytes, 0).end()
+
+    while src_program_idx < end_of_input_idx:
+        match = match_lexeme(src_program_bytes, src_program_idx)
+        if match is not None:
+            final_state = group_final_states[match.lastgroup]
+            end_idx = match.end()
+        else: # The DFA raises the error of the invalid lexeme
+            final_state, end_idx = lexer.match_lexeme(src_program_bytes[:].decode("ascii"), src_program_idx)
+
+        token_type = final_state_token_types.get(final_state)
+        if token_type is None: # Only the lexemes whose token type depends on their text are decoded
+            token_type = token_kind_by_final_state(final_state, src_program_bytes[src_program_idx:end_idx].decode("ascii"))
+        if token_type != TokenType.SKIP:
+            yield token_type, src_program_idx, end_idx
+        src_program_idx = skip_ignored(src_program_bytes, end_idx).end()
+
+    yield TokenType.EOF, src_program_idx, src_program_idx
+
+def tokenize_text(lexer, path):
+
+    """
+
+    This function lexes a source file by reading it into a string in text mode, like main.py does, so that the
+    line endings of Windows are read as newlines.
+
+    Parameters:
+        lexer (Lexer): The lexer that lexes the source file.
+        path (str): The path of the source file.
+
+    Returns:
+        TokenBuffer: The tokens of the source file.
+
+    """
+
+    with open(path, "r", encoding="utf-8") as file:
+        return lexer.tokenize(file.read())
+
+def tokenize_path(lexer, path):
+
+    """
+
+    This function lexes a source file by memory-mapping it. Files that are empty, or contain carriage returns or
+    characters that are not ASCII, are read into a string and lexed by the engine of the lexer instead.
+
+    Parameters:
+        lexer (Lexer): The lexer that lexes the source file.
+        path (str): The path of the source file.
+
+    Returns:
+        TokenBuffer: The tokens of the source file.
+
+    """
+
+    with open(path, "rb") as file:
+        if file.seek(0, 2) == 0: # An empty file cannot be memory-mapped
+            return lexer.tokenize("")
+        src_program_bytes = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) # The mapping stays valid after the file is closed
+
+    if src_program_bytes.find(b"\r") != -1 or NON_ASCII_PATTERN.search(src_program_bytes) is not None:
+        src_program_bytes.close()
+        return tokenize_text(lexer, path) # The line endings are translated and the characters decoded when reading text
+
+    token_buffer = MappedTokenBuffer(src_program_bytes, bytes_line_index(src_program_bytes), lexer.intern_table)
+    for token_type, start_idx, end_idx in iter_bytes_spans(lexer, src_program_bytes):
+        token_buffer.append(token_type, start_idx, end_idx)
+    return token_buffer
@@ -0,0 +1,139 @@
+"""
+
+This file contains the NumPy engine of the lexer. It classifies every character of the input at once with a
+lookup table gather and finds the ends of the identifier, digit and whitespace runs with vectorized operations,
+so that the DFA of the lexer only runs for the lexemes that do not start one of these runs.
+
+NumPy is an optional dependency, it is only needed when this engine is selected with Lexer(engine="numpy").
+
+"""
+
+from array import array
+from dfa import CATEGORY_INDEX, CHARACTER_CLASSES, DFAStates, character_class
+from regex_lexer import IGNORED_PATTERN
+from tokens import IDENTIFIER_FINAL_STATE, token_kind_by_final_state, TokenType
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# The final states of the DFA for integer and floating point literals
+INT_LITERAL_FINAL_STATE = DFAStates.S_18.value
+FLOAT_LITERAL_FINAL_STATE = DFAStates.S_20.value
+
+# The categories that make up the runs found by this engine
+WORD_CATEGORIES = [CATEGORY_INDEX['digit'], CATEGORY_INDEX['hex'], CATEGORY_INDEX['letter'], CATEGORY_INDEX['underscore']]
+BLANK_CATEGORIES = [CATEGORY_INDEX['whitespace'], CATEGORY_INDEX['newline']]
+
+DIGIT = CATEGORY_INDEX['digit']
+HEX = CATEGORY_INDEX['hex']
+LETTER = CATEGORY_INDEX['letter']
+SLASH = CATEGORY_INDEX['slash']
+DOT = CATEGORY_INDEX['dot']
+WHITESPACE = CATEGORY_INDEX['whitespace']
+NEWLINE = CATEGORY_INDEX['newline']
+
+def classify_characters(src_program_str):
+
+    """
+
+    This function returns the category index of every character of the source program string.
+
+    Parameters:
+        src_program_str (str): The source program string.
+
+    Returns:
+        numpy.ndarray: The category index of every character, as uint8.
+
+    """
+
+    character_classes = numpy.frombuffer(CHARACTER_CLASSES, dtype=numpy.uint8)
+
+    if src_program_str.isascii():
+        codes = numpy.frombuffer(src_program_str.encode("ascii"), dtype=numpy.uint8)
+        return character_classes[codes]
+
+    codes = numpy.frombuffer(src_program_str.encode("utf-32-le", "surrogatepass"), dtype="<u4")
+    categories = character_classes[numpy.minimum(codes, len(CHARACTER_CLASSES) - 1)]
+    for src_program_idx in numpy.flatnonzero(codes >= len(CHARACTER_CLASSES)).tolist(): # Only characters outside of the table take the slow path
+        categories[src_program_idx] = character_class(src_program_str[src_program_idx])
+    return categories
+
+def run_ends(in_run):
+
+    """
+
+    This function returns, for every index, the index one past the end of the run of True values that contains it.
+    For an index that is not in a run this is the index itself.
+
+    Parameters:
+        in_run (numpy.ndarray): Whether each character is part of a run.
+
+    Returns:
+        array: The end of the run of every index, as unsigned integers.
+
+    """
+
+    run_stops = numpy.append(numpy.flatnonzero(~in_run), len(in_run)) # The first index after every run
+    run_lengths = numpy.diff(run_stops, prepend=-1) # The number of indices that each stop ends
+    ends = numpy.repeat(run_stops, run_lengths)[:len(in_run)]
+    return array('I', ends.astype(numpy.uint32).tobytes())
+
+def iter_numpy_spans(lexer, src_program_str):
+
+    """
+
+    This function lazily generates the spans of the tokens in the source program string. Identifiers, integer and
+    floating point literals and whitespace are taken from the precomputed runs, and every other lexeme is matched
+    by the DFA of the lexer, so the spans and errors are the same as the ones of the DFA engine.
+
+    Parameters:
+        lexer (Lexer): The lexer whose DFA is used for the lexemes that do not start a run.
+        src_program_str (str): The source program string.
+
+    Yields:
+        tuple: The token type, start index and end index of the next non-SKIP token, followed by a final EOF span.
+
+    """
+
+    categories = classify_characters(src_program_str)
+    word_run_ends = run_ends(numpy.isin(categories, WORD_CATEGORIES))
+    digit_run_ends = run_ends(categories == DIGIT)
+    blank_run_ends = run_ends(numpy.isin(categories, BLANK_CATEGORIES))
+    categories = categories.tobytes() # Indexing bytes is faster than indexing a NumPy array one element at a time
+
+    end_of_input_idx = len(src_program_str)
+    src_program_idx = 0
+
+    while src_program_idx < end_of_input_idx:
+        category = categories[src_program_idx]
+
+        if category == WHITESPACE or category == NEWLINE:
+            src_program_idx = blank_run_ends[src_program_idx]
+            continue
+
+        if category == SLASH:
+            end_idx = IGNORED_PATTERN.match(src_program_str, src_program_idx).end()
+            if end_idx > src_program_idx: # Skip a comment, an unterminated block comment is left to the DFA
+                src_program_idx = end_idx
+                continue
+
+        if category == LETTER or category == HEX:
+            final_state = IDENTIFIER_FINAL_STATE
+            end_idx = word_run_ends[src_program_idx]
+        elif category == DIGIT:
+            final_state = INT_LITERAL_FINAL_STATE
+            end_idx = digit_run_ends[src_program_idx]
+            if end_idx + 1 < end_of_input_idx and categories[end_idx] == DOT and categories[end_idx + 1] == DIGIT:
+                final_state = FLOAT_LITERAL_FINAL_STATE
+                end_idx = digit_run_ends[end_idx + 1]
+        else:
+            final_state, end_idx = lexer.match_lexeme(src_program_str, src_program_idx)
+
+        token_type = token_kind_by_final_state(final_state, src_program_str[src_program_idx:end_idx])
+        if token_type != TokenType.SKIP:
+            yield token_type, src_program_idx, end_idx
+        src_program_idx = end_idx
+
+    yield TokenType.EOF, src_program_idx, src_program_idx
@@ -0,0 +1,188 @@
+"""
+
+This file contains the chunk-parallel lexing of large source programs. The source program is split at newlines
+into chunks that are lexed in separate processes, and the tokens of the chunks are stitched together in order.
+A chunk may start inside a block comment, which its worker cannot know, so the stitching re-lexes the source
+program serially from any block comment that is not terminated within its chunk until the tokens line up with
+the tokens of a later chunk again. The result is the same as the one of Lexer.tokenize.
+
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+import os
+from incremental_lexer import shifted, unterminated_comment_token
+from line_index import LineIndex
+from tokens import TokenBuffer, TokenType
+
+# Source programs shorter than this are lexed serially, since starting the worker processes would take longer
+MIN_PARALLEL_SIZE = 1 << 20
+
+def split_chunks(src_program_str, num_chunks):
+
+    """
+
+    This function splits the source program into chunks of about the same size that end just after a newline,
+    except for the last one.
+
+    Parameters:
+        src_program_str (str): The source program string.
+        num_chunks (int): The number of chunks to split the source program into.
+
+    Returns:
+        list: The start and end index of every chunk.
+
+    """
+
+    chunks = []
+    chunk_size = len(src_program_str) // num_chunks + 1
+    chunk_start = 0
+    while chunk_start < len(src_program_str):
+        newline_idx = src_program_str.find("\n", chunk_start + chunk_size)
+        chunk_end = len(src_program_str) if newline_idx == -1 else newline_idx + 1
+        chunks.append((chunk_start, chunk_end))
+        chunk_start = chunk_end
+    return chunks
+
+def lex_chunk(chunk_str, chunk_start, engine):
+
+    """
+
+    This function lexes a chunk of the source program in a worker process, as if it started at a token boundary.
+
+    Parameters:
+        chunk_str (str): The text of the chunk.
+        chunk_start (int): The index of the chunk in the source program string.
+        engine (str): The lexer engine to lex the chunk with.
+
+    Returns:
+        tuple: The kinds, starts, ends and symbol ids of the tokens of the chunk, without the EOF token, the index up
+               to which the tokens do not depend on the text after the chunk, the indices of the newlines of the chunk
+               and the names of the symbol ids of the chunk. The indices are relative to the whole source program.
+
+    """
+
+    from lexer import Lexer # Imported here because lexer imports this module
+
+    lexer = Lexer(engine=engine)
+    line_index = LineIndex(chunk_str)
+    newline_offsets = shifted(line_index.newline_offsets, chunk_start)
+
+    try:
+        token_buffer = lexer.tokenize(chunk_str)
+    except Exception: # The chunk may start inside a block comment, so the error is left to the serial re-lexing
+        return b"", b"", b"", b"", chunk_start, newline_offsets.tobytes(), []
+
+    num_tokens = len(token_buffer) - 1 # Without the EOF token of the chunk
+    valid_end = chunk_start + len(chunk_str)
+    comment_token = unterminated_comment_token(token_buffer, len(chunk_str))
+    if comment_token is not None: # The block comment may be terminated in a later chunk
+        num_tokens = comment_token
+        valid_end = chunk_start + token_buffer.starts[comment_token]
+
+    kinds = bytes(token_buffer.kinds[:num_tokens])
+    starts = shifted(token_buffer.starts[:num_tokens], chunk_start).tobytes()
+    ends = shifted(token_buffer.ends[:num_tokens], chunk_start).tobytes()
+    symbol_ids = token_buffer.symbol_ids[:num_tokens].tobytes()
+    return kinds, starts, ends, symbol_ids, valid_end, newline_offsets.tobytes(), token_buffer.intern_table.names
+
+def translate_symbol_ids(intern_table, names, symbol_ids, is_prefix):
+
+    """
+
+    This function translates the symbol ids of the tokens of a chunk into the symbol ids of the intern table of the
+    whole source program, interning the names in the order of their first occurrence like the serial lexing does.
+
+    Parameters:
+        intern_table (InternTable): The intern table of the whole source program.
+        names (list): The names of the symbol ids of the chunk, in the order of their first occurrence in the chunk.
+        symbol_ids (array): The symbol ids of the tokens taken from the chunk, and -1 for the other tokens.
+        is_prefix (bool): Whether the tokens are the first tokens of the chunk.
+
+    Returns:
+        array: The symbol ids of the tokens in the intern table of the whole source program.
+
+    """
+
+    if is_prefix: # The symbol ids of a prefix of the chunk are the first ones, in the order of their first occurrence
+        translation = [intern_table.intern(name) for name in names[:max(symbol_ids, default=-1) + 1]]
+    else:
+        translation = [None] * len(names)
+        for symbol_id in symbol_ids:
+            if symbol_id >= 0 and translation[symbol_id] is None:
+                translation[symbol_id] = intern_table.intern(names[symbol_id])
+    translation.append(-1) # The tokens that are not identifiers index the last element with -1
+    return array('i', map(translation.__getitem__, symbol_ids))
+
+def tokenize_parallel(lexer, src_program_str, max_workers=None):
+
+    """
+
+    This function lexes the source program in chunks in parallel and stitches the tokens of the chunks together.
+
+    Parameters:
+        lexer (Lexer): The lexer whose engine lexes the chunks and whose DFA re-lexes the block comments.
+        src_program_str (str): The source program string.
+        max_workers (int): The number of worker processes, by default the number of CPUs.
+
+    Returns:
+        TokenBuffer: The tokens generated from the source program string, the same as the ones of Lexer.tokenize.
+
+    """
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers < 2 or len(src_program_str) < MIN_PARALLEL_SIZE:
+        return lexer.tokenize(src_program_str)
+
+    chunks = split_chunks(src_program_str, max_workers)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(lex_chunk, src_program_str[chunk_start:chunk_end], chunk_start, lexer.engine) for chunk_start, chunk_end in chunks]
+        results = []
+        for future in futures:
+            kinds, starts, ends, symbol_ids, valid_end, newline_offsets, names = future.result()
+            results.append((kinds, array('I', starts), array('I', ends), array('i', symbol_ids), valid_end, array('I', newline_offsets), names))
+
+    newline_offsets = array('I')
+    for result in results:
+        newline_offsets.extend(result[5])
+    token_buffer = TokenBuffer(src_program_str, LineIndex(src_program_str, newline_offsets), lexer.intern_table)
+
+    chunk_starts = [chunk_start for chunk_start, _ in chunks]
+    src_program_idx = 0 # The index where the serial lexing would continue, which is a token start or a chunk start
+    chunk_idx = 0
+    while chunk_idx < len(chunks):
+        kinds, starts, ends, symbol_ids, valid_end, _, names = results[chunk_idx]
+
+        # The tokens of the chunk are the serial ones from the index where the serial lexing continues until the valid end
+        first_token = bisect_left(starts, src_program_idx)
+        last_token = bisect_left(starts, valid_end)
+        token_buffer.kinds += kinds[first_token:last_token]
+        token_buffer.starts += starts[first_token:last_token]
+        token_buffer.ends += ends[first_token:last_token]
+        token_buffer.symbol_ids += translate_symbol_ids(token_buffer.intern_table, names, symbol_ids[first_token:last_token], first_token == 0)
+
+        if valid_end == chunks[chunk_idx][1]:
+            src_program_idx = valid_end
+            chunk_idx += 1
+            continue
+
+        # Re-lex from the last valid token until a token starts where a valid token of a later chunk starts
+        restart_idx = ends[last_token - 1] if last_token > first_token else src_program_idx
+        for token_type, start_idx, end_idx in lexer.iter_dfa_spans(src_program_str, restart_idx):
+            if token_type == TokenType.EOF:
+                chunk_idx = len(chunks)
+                break
+            resync_chunk = bisect_right(chunk_starts, start_idx) - 1
+            if resync_chunk > chunk_idx:
+                _, resync_starts, _, _, resync_valid_end, _, _ = results[resync_chunk]
+                resync_token = bisect_left(resync_starts, start_idx)
+                if start_idx < resync_valid_end and resync_token < len(resync_starts) and resync_starts[resync_token] == start_idx:
+                    src_program_idx = start_idx
+                    chunk_idx = resync_chunk
+                    break
+            token_buffer.append(token_type, start_idx, end_idx)
+
+    end_of_input_idx = len(src_program_str)
+    token_buffer.append(TokenType.EOF, end_of_input_idx, end_of_input_idx)
+    return token_buffer
@@ -0,0 +1,199 @@
+"""
+
+This file contains the parallel parsing of programs with many top-level function declarations. The tokens of the
+program are split by brace matching into chunks of whole top-level statements, keeping every top-level function
+declaration in one piece, and the chunks are parsed in separate processes. The statements of the chunks are merged
+into one program node in source order.
+
+"""
+
+import os
+import pickle
+import re
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import astnodes as ast
+from line_index import LineIndex
+from tokens import Token, TOKEN_TYPES_BY_VALUE, TokenType
+
+# Programs with fewer tokens than this are parsed serially, since starting the worker processes would take longer
+MIN_PARALLEL_TOKENS = 1 << 16
+
+# The number of chunks per worker, so that the workers stay busy when the functions differ in size
+CHUNKS_PER_WORKER = 4
+
+# Matches the tokens that decide where the top-level statements start and end
+STRUCTURE_PATTERN = re.compile(b"[" + re.escape(bytes([TokenType.FUN.value, TokenType.LEFT_BRACE.value, TokenType.RIGHT_BRACE.value])) + b"]")
+
+def split_top_level_statements(token_buffer):
+
+    """
+
+    This function splits the tokens of a program into segments, one for every top-level function declaration and
+    one for every run of other top-level statements, by matching the braces that follow every top-level 'fun'.
+
+    Parameters:
+        token_buffer (TokenBuffer): The tokens of the program.
+
+    Returns:
+        list: The index of the first token and the index one past the last token of every segment.
+
+    """
+
+    kinds = token_buffer.kinds
+    num_tokens = len(kinds) - 1 # Without the EOF token
+    segments = []
+    segment_start = 0
+    function_start = None # The index of the 'fun' token of the top-level function declaration being matched
+    depth = 0
+
+    for match in STRUCTURE_PATTERN.finditer(kinds, 0, num_tokens):
+        token_idx = match.start()
+        kind = kinds[token_idx]
+        if kind == TokenType.LEFT_BRACE.value:
+            depth += 1
+        elif kind == TokenType.RIGHT_BRACE.value:
+            depth -= 1
+            if depth == 0 and function_start is not None: # The body of the function declaration has ended
+                segments.append((function_start, token_idx + 1))
+                segment_start = token_idx + 1
+                function_start = None
+        elif depth == 0 and function_start is None: # A top-level function declaration starts
+            if segment_start < token_idx:
+                segments.append((segment_start, token_idx))
+            function_start = token_idx
+
+    if segment_start < num_tokens:
+        segments.append((segment_start, num_tokens))
+    return segments
+
+def group_segments(segments, num_chunks):
+
+    """
+
+    This function groups consecutive segments into chunks with about the same number of tokens.
+
+    Parameters:
+        segments (list): The first and one past the last token of every segment, in source order.
+        num_chunks (int): The number of chunks to group the segments into.
+
+    Returns:
+        list: The index of the first token and the index one past the last token of every chunk.
+
+    """
+
+    chunk_size = segments[-1][1] // num_chunks + 1
+    chunks = []
+    chunk_start = segments[0][0]
+    for _, segment_end in segments:
+        if segment_end - chunk_start >= chunk_size:
+            chunks.append((chunk_start, segment_end))
+            chunk_start = segment_end
+    if chunk_start < segments[-1][1]:
+        chunks.append((chunk_start, segments[-1][1]))
+    return chunks
+
+def iter_chunk_tokens(chunk_str, chunk_start, first_line, kinds, starts, ends, symbol_ids):
+
+    """
+
+    This function lazily generates the tokens of a chunk of the program, followed by an EOF token.
+
+    Parameters:
+        chunk_str (str): The text of the program from the first to the last token of the chunk.
+        chunk_start (int): The index of the text of the chunk in the program.
+        first_line (int): The line number of the first token of the chunk.
+        kinds (bytes): The token type values of the tokens of the chunk.
+        starts (array): The index of the first character of every lexeme in the program.
+        ends (array): The index one past the last character of every lexeme in the program.
+        symbol_ids (array): The symbol id of every identifier, and -1 for the other tokens.
+
+    Yields:
+        Token: The next token of the chunk.
+
+    """
+
+    line_index = LineIndex(chunk_str)
+    line_offset = first_line - 1
+    for kind, start, end, symbol_id in zip(kinds, starts, ends, symbol_ids):
+        yield Token(TOKEN_TYPES_BY_VALUE[kind], chunk_str[start - chunk_start:end - chunk_start], line_index.line(start - chunk_start) + line_offset, symbol_id if symbol_id >= 0 else None)
+    yield Token(TokenType.EOF, "EOF", line_index.line(len(chunk_str)) + line_offset)
+
+def parse_chunk(chunk_str, chunk_start, first_line, kinds, starts, ends, symbol_ids):
+
+    """
+
+    This function parses a chunk of whole top-level statements in a worker process.
+
+    Parameters:
+        chunk_str (str): The text of the program from the first to the last token of the chunk.
+        chunk_start (int): The index of the text of the chunk in the program.
+        first_line (int): The line number of the first token of the chunk.
+        kinds (bytes): The token type values of the tokens of the chunk.
+        starts (bytes): The index of the first character of every lexeme in the program, as unsigned integers.
+        ends (bytes): The index one past the last character of every lexeme in the program, as unsigned integers.
+        symbol_ids (bytes): The symbol id of every identifier, and -1 for the other tokens, as signed integers.
+
+    Returns:
+        bytes: The pickled statement nodes of the chunk, or None if the chunk could not be parsed.
+
+    """
+
+    from parser_ import Parser # Imported here because parser_ imports this module
+
+    tokens = iter_chunk_tokens(chunk_str, chunk_start, first_line, kinds, array('I', starts), array('I', ends), array('i', symbol_ids))
+    with ast.paused_gc():
+        try:
+            return pickle.dumps(Parser(tokens=tokens).parse_program().statements, pickle.HIGHEST_PROTOCOL)
+        except Exception: # The error is left to the serial parse, which reports it exactly like a serial run
+            return None
+
+def parse_program_parallel(token_buffer, max_workers=None):
+
+    """
+
+    This function parses the chunks of a program in parallel and merges their statements into one program node.
+
+    Parameters:
+        token_buffer (TokenBuffer): The tokens of the program.
+        max_workers (int): The number of worker processes, by default the number of CPUs.
+
+    Returns:
+        ASTProgramNode: The program node, or None if the program should be parsed serially, either because it is
+                        too small or has too few statements or because a chunk could not be parsed.
+
+    """
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers < 2 or len(token_buffer) < MIN_PARALLEL_TOKENS:
+        return None
+
+    segments = split_top_level_statements(token_buffer)
+    if len(segments) < 2:
+        return None
+    chunks = group_segments(segments, max_workers * CHUNKS_PER_WORKER)
+
+    src_program_str = token_buffer.src_program
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = []
+        for first_token, last_token in chunks:
+            chunk_start = token_buffer.starts[first_token]
+            chunk_end = token_buffer.ends[last_token - 1]
+            chunk_str = src_program_str[chunk_start:chunk_end]
+            if isinstance(chunk_str, bytes): # The source program of a MappedTokenBuffer is the mapped ASCII file
+                chunk_str = chunk_str.decode("ascii")
+            futures.append(executor.submit(
+                parse_chunk, chunk_str, chunk_start, token_buffer.line(first_token),
+                bytes(token_buffer.kinds[first_token:last_token]), token_buffer.starts[first_token:last_token].tobytes(),
+                token_buffer.ends[first_token:last_token].tobytes(), token_buffer.symbol_ids[first_token:last_token].tobytes(),
+            ))
+
+        program = ast.ASTProgramNode()
+        with ast.paused_gc(): # Unpickling the AST nodes is several times faster without the cycle collector running
+            for future in futures:
+                statements = future.result()
+                if statements is None:
+                    executor.shutdown(cancel_futures=True)
+                    return None
+                program.statements.extend(pickle.loads(statements))
+    return program
@@ -1,14 +1,39 @@
+from bisect import bisect_left
 import lexer
 import astnodes as ast
-from tokens import TokenType
+import parallel_parser
+from tokens import TokenBuffer, TokenType
+
+# The precedence of the token types of the binary operators, the operators with higher precedence bind more tightly
+BINARY_OPERATOR_PRECEDENCE = {
+    TokenType.RELATIONAL_OP: 1,
+    TokenType.ADDITIVE_OP: 2,
+    TokenType.MULTIPLICATIVE_OP: 3,
+}
+
+# The token types that the parser skips to after a syntax error in the error recovery mode
+SYNCHRONIZING_TOKEN_TYPES = frozenset({
+    TokenType.SEMICOLON, TokenType.RIGHT_BRACE, TokenType.EOF, TokenType.LET, TokenType.IF, TokenType.FOR,
+    TokenType.WHILE, TokenType.RETURN, TokenType.FUN, TokenType.PRINT, TokenType.DELAY, TokenType.WRITE,
+    TokenType.WRITE_BOX,
+})
 
 # To do:  lexer check for EOF taken and make work with empty string
 class Parser:
-    def __init__(self, src_program_str):
-        self.lexer = lexer.Lexer()
+    def __init__(self, src_program_str=None, tokens=None, error_recovery=False):
+        self.lexer = lexer.Lexer(error_recovery=error_recovery)
+        self.error_recovery = error_recovery # Whether syntax errors are recorded and parsing continues after them
+        self.errors = [] # The lexical and syntax errors found with error recovery
         self.index = -1  
         self.src_program = src_program_str
-        self.tokens = self.lexer.generate_tokens(self.src_program)
+        self.token_source = tokens # The tokens that were passed in, which the parallel mode needs to be a TokenBuffer
+        if tokens is None: # Lex the source program only if the tokens have not been lexed already
+            tokens = self.lexer.iter_tokens(self.src_program)
+        self.token_iterator = iter(tokens) # The tokens are pulled one at a time, so they never have to be stored together
+        self.error_token_indices = [] # The indices of the ERROR tokens pulled, whose lexical errors are already reported
+        if error_recovery:
+            self.token_iterator = self.track_error_tokens(self.token_iterator)
+        self.window = [None, None] # Ring buffer of the current and next token, indexed by the parity of the token index
         self.crtToken = lexer.Token("", lexer.TokenType.ERROR, -1)
         self.nextToken = lexer.Token("", lexer.TokenType.ERROR, -1)
         self.ASTroot = ast.ASTProgramNode() 
@@ -24,6 +49,88 @@ class Parser:
         
         """
 
+        steps = self.compound_statement_steps() # Statements that contain blocks are parsed with an explicit stack
+        if steps is not None:
+            return self.run_steps(steps)
+        return self.parse_simple_statement()
+
+    def compound_statement_steps(self):
+
+        """
+
+        Start parsing a statement that contains a block, if the current token starts one
+
+        Returns:
+            generator: The steps of the statement, or None if the statement does not contain a block
+
+        """
+
+        match self.crtToken.TokenType:
+            case TokenType.IF:
+                return self.if_statement_steps()
+            case TokenType.FOR:
+                return self.for_statement_steps()
+            case TokenType.WHILE:
+                return self.while_statement_steps()
+            case TokenType.FUN:
+                return self.function_declaration_steps()
+            case TokenType.LEFT_BRACE:
+                return self.block_steps()
+        return None
+
+    def run_steps(self, steps):
+
+        """
+
+        Run the steps of a statement that contains blocks. The steps yield the steps of every nested block or statement
+        that they need parsed and receive its node back, and the suspended steps are kept on an explicit stack instead
+        of the Python call stack, so the nesting depth is only limited by memory
+
+        Parameters:
+            steps (generator): The steps of the statement
+
+        Returns:
+            ASTNode: The node of the statement
+
+        """
+
+        stack = [steps] # The steps that are waiting for the node of the steps above them
+        node = None # The node to send to the steps on top of the stack
+        error = None # The exception to raise in the steps on top of the stack instead, as a recursive call would
+        while True:
+            try:
+                if error is None:
+                    nested_steps = stack[-1].send(node) # Resume the steps on top of the stack
+                else:
+                    nested_steps = stack[-1].throw(error)
+            except StopIteration as stop: # The steps have built their node
+                stack.pop()
+                if not stack:
+                    return stop.value
+                node = stop.value
+                error = None
+                continue
+            except Exception as exception: # The steps have failed, so the exception is passed on to the steps below them
+                stack.pop()
+                if not stack:
+                    raise
+                error = exception
+                continue
+            stack.append(nested_steps)
+            node = None
+            error = None
+
+    def parse_simple_statement(self):
+
+        """
+
+        Parse a statement that does not contain a block
+
+        Returns:
+            ASTNode: A statement node
+
+        """
+
         match self.crtToken.TokenType:
             case TokenType.LET:
                 return self.parse_variable_declartion()
@@ -35,18 +142,8 @@ class Parser:
                 return self.parse_delay_statement()
             case TokenType.WRITE | TokenType.WRITE_BOX:
                 return self.parse_write_statement()
-            case TokenType.IF:
-                return self.parse_if_statement()
-            case TokenType.FOR:
-                return self.parse_for_statement()
-            case TokenType.WHILE:
-                return self.parse_while_statement()
             case TokenType.RETURN:
                 return self.parse_return_statement()
-            case TokenType.FUN:
-                return self.parse_function_declaration()
-            case TokenType.LEFT_BRACE:
-                return self.parse_block()
             case _:
                 raise Exception("Invalid statement on line ", self.crtToken.line)
     
@@ -163,77 +260,64 @@ class Parser:
 
         """
         
-        Parses an expression
+        Parses an expression by precedence climbing over the binary operators, using explicit stacks of operands and
+        operators instead of one recursive call per precedence level, so that operator chains of any length can be parsed.
+        As in the grammar, the operand of the prefix operators '-', 'not' and '__random_int' is the whole expression
+        after them, so '-a - b' is '-(a - b)' and '__random_int 10 + 1' is '__random_int (10 + 1)'
 
         Returns:
             ASTNode: An expression node
         
         """
 
-        line = self.crtToken.line
+        operand_lines = [self.crtToken.line] # The line of the first token of every operand on the stack
+        operands = [self.parse_factor()] # Parse the first factor
+        operators = [] # The precedence and value of every operator on the stack, in increasing order of precedence
 
-        expression = self.parse_simple_expression()
+        while self.crtToken.TokenType in BINARY_OPERATOR_PRECEDENCE: # Check if the next token is a binary operator
+            precedence = BINARY_OPERATOR_PRECEDENCE[self.crtToken.TokenType]
+            while operators and operators[-1][0] >= precedence: # Operators of the same precedence are left associative
+                self.reduce_binary_operation(operands, operand_lines, operators)
+            operators.append((precedence, self.crtToken.value)) # Get the operator
+            self.advance() # Advance to the first token of the right operand
+            operand_lines.append(self.crtToken.line)
+            operands.append(self.parse_factor()) # Parse the right operand
+
+        while operators: # Build the remaining binary operation nodes
+            self.reduce_binary_operation(operands, operand_lines, operators)
+        expression = operands[0]
 
-        if(self.crtToken.TokenType == TokenType.RELATIONAL_OP): # Check if the next token is a relational operator
-            operator = self.crtToken.value # Get the operator
-            self.advance() # Set the operator as the current token
-            expression = ast.ASTBinaryOpNode(expression, self.parse_simple_expression(), operator, line) # Return the binary operation node
-        
         if(self.crtToken.TokenType == TokenType.AS): # Check if the expression is typcasted
-            if (self.nextToken.TokenType == TokenType.TYPE): # Check if the next token is a type
-                self.advance() # Set the type as the current token
-                expression.add_type(self.crtToken.value) # Add the type to the simple expression
-                self.advance() # Advance to the next token
-            else:
-                raise Exception("Expected type after as on line ", self.crtToken.line)
+            line = self.crtToken.line
+            self.advance() # Set the type as the current token, so that a token other than a type is the rejected one
+            if (self.crtToken.TokenType != TokenType.TYPE): # Check if the current token is a type
+                raise Exception("Expected type after as on line ", line)
+            expression.add_type(self.crtToken.value) # Add the type to the expression
+            self.advance() # Advance to the next token
         else:
             expression.add_type(None)
 
-        return expression # Return the simple expression node
+        return expression # Return the expression node
 
-    def parse_simple_expression(self):
+    def reduce_binary_operation(self, operands, operand_lines, operators):
 
         """
-        
-        Parse a simple expression
 
-        Returns:
-            ASTNode: A simple expression node
-        
-        """
-
-        line = self.crtToken.line
-
-        term = self.parse_term() # Parse the term
-
-        if self.crtToken.TokenType == TokenType.ADDITIVE_OP: # Check if the next token is an addition operator
-            operator = self.crtToken.value # Get the operator
-            self.advance() # Set the operator as the current token
-            return ast.ASTBinaryOpNode(term, self.parse_term(), operator, line) # Return the binary operation node
+        Replaces the operator on top of the operator stack and its two operands with a binary operation node
 
-        return term # Return the term node
-
-    def parse_term(self):
-
-        """
-        
-        Parse a term
+        Parameters:
+            operands (list): The stack of operand nodes
+            operand_lines (list): The line of the first token of every operand on the stack
+            operators (list): The stack of operators and their precedences
 
-        Returns:
-            ASTNode: A term node
-        
         """
 
-        line = self.crtToken.line
-
-        factor = self.parse_factor() # Parse the factor
-
-        if self.crtToken.TokenType == TokenType.MULTIPLICATIVE_OP: # Check if the next token is a multiplication operator
-            operator = self.crtToken.value # Get the operator
-            self.advance() # Set the operator as the current token
-            return ast.ASTBinaryOpNode(factor, self.parse_factor(), operator, line) # Return the binary operation node
-        
-        return factor # Return the factor node
+        right = operands.pop() # The right operand is on top of the stack
+        operand_lines.pop()
+        operator = operators.pop()[1]
+        node = ast.ASTBinaryOpNode(operands[-1], right, operator, operand_lines[-1]) # The node starts on the line of its left operand
+        node.add_type(None)
+        operands[-1] = node
 
     def parse_factor(self):
 
@@ -275,17 +359,23 @@ class Parser:
                 operator = self.crtToken.value
                 line = self.crtToken.line
                 self.advance()
-                return ast.ASTUnaryNode(operator, self.parse_expression(), line)
+                node = ast.ASTUnaryNode(operator, self.parse_expression(), line)
+                node.add_type(None)
+                return node
             case TokenType.ADDITIVE_OP:
                 if self.crtToken.value == "-":
                     operator = self.crtToken.value
                     line = self.crtToken.line
                     self.advance()
-                    return ast.ASTUnaryNode(operator, self.parse_expression(), line)
+                    node = ast.ASTUnaryNode(operator, self.parse_expression(), line)
+                    node.add_type(None)
+                    return node
             case TokenType.RANDOM_INT:
                 line = self.crtToken.line
                 self.advance() # Advance to the next token - random int is skipped
-                return ast.ASTRandomNode(self.parse_expression(), line)
+                node = ast.ASTRandomNode(self.parse_expression(), line)
+                node.add_type(None)
+                return node
             case TokenType.LEFT_PAREN:
                 self.advance() # Advance to the next token - left parenthesis is skipped
                 sub_expression = self.parse_expression()
@@ -301,7 +391,9 @@ class Parser:
                     raise Exception("Expected ',' on line ", self.crtToken.line)
                 self.advance() # Advance to the next token - comma is skipped
                 expression_2 = self.parse_expression()
-                return ast.ASTReadNode(expression_1, expression_2, line)
+                node = ast.ASTReadNode(expression_1, expression_2, line)
+                node.add_type(None)
+                return node
             case _:
                 raise Exception("Invalid factor on line ", self.crtToken.line)
 
@@ -339,7 +431,9 @@ class Parser:
 
         self.advance() # Advance to the next token as the right parenthesis is skipped  
         
-        return ast.ASTFunctionCallNode(function_name, parameters, line) # Return the function call node
+        node = ast.ASTFunctionCallNode(function_name, parameters, line) # Return the function call node
+        node.add_type(None)
+        return node
 
     def parse_actual_parameters(self):
 
@@ -551,6 +645,19 @@ class Parser:
         return write_node
 
     def parse_if_statement(self):
+
+        """
+
+        Parse an if statement
+
+        Returns:
+            ASTNode: An if statement node
+
+        """
+
+        return self.run_steps(self.if_statement_steps())
+
+    def if_statement_steps(self):
         
         line = self.crtToken.line
         self.advance() # Advance to the next token - if is skipped
@@ -567,17 +674,30 @@ class Parser:
         
         self.advance() # Advance to the next token - right parenthesis is skipped
 
-        true_block = self.parse_block() # Parse the block
+        true_block = yield self.block_steps() # Parse the block
 
         false_block = None # Optional block
 
         if self.crtToken.TokenType == TokenType.ELSE: # Check if the next token is an else
             self.advance() # Advance to the next token - else is skipped
-            false_block = self.parse_block() # Parse the optional block
+            false_block = yield self.block_steps() # Parse the optional block
 
         return ast.ASTIfNode(condition, true_block, false_block, line) # Return the if statement node
 
     def parse_for_statement(self):
+
+        """
+
+        Parse a for statement
+
+        Returns:
+            ASTNode: A for statement node
+
+        """
+
+        return self.run_steps(self.for_statement_steps())
+
+    def for_statement_steps(self):
         
         line = self.crtToken.line
         self.advance() # Advance to the next token - for is skipped
@@ -608,15 +728,28 @@ class Parser:
         
         self.advance() # Advance to the next token - right parenthesis is skipped
 
-        block = self.parse_block() # Parse the block
+        block = yield self.block_steps() # Parse the block
 
         return ast.ASTForNode(variable, condition, increment, block, line) # Return the for statement node
 
     def parse_while_statement(self):
 
         """
-        
+
         Parse a while statement
+
+        Returns:
+            ASTNode: A while statement node
+
+        """
+
+        return self.run_steps(self.while_statement_steps())
+
+    def while_statement_steps(self):
+
+        """
+        
+        Parse a while statement, yielding the steps of its block to run_steps
         
         Returns:
             ASTNode: A while statement node
@@ -638,7 +771,7 @@ class Parser:
         
         self.advance() # Advance to the next token - right parenthesis is skipped
 
-        block = self.parse_block()
+        block = yield self.block_steps()
 
         return ast.ASTWhileNode(condition, block, line)
 
@@ -671,6 +804,19 @@ class Parser:
 
         Parse a function declaration
 
+        Returns:
+            ASTNode: A function declaration node
+
+        """
+
+        return self.run_steps(self.function_declaration_steps())
+
+    def function_declaration_steps(self):
+
+        """
+
+        Parse a function declaration, yielding the steps of its block to run_steps
+
         Returns:
             ASTNode: A function declaration node
 
@@ -709,7 +855,7 @@ class Parser:
         
         self.advance() # Advance to the next token
 
-        func_block = self.parse_block() # Parse the block
+        func_block = yield self.block_steps() # Parse the block
 
         return ast.ASTFunctionNode(function_name, parameters, return_type, func_block, line) # Return the function declaration node
     
@@ -779,6 +925,19 @@ class Parser:
 
         Parse a block
 
+        Returns:
+            ASTNode: A block node
+
+        """
+
+        return self.run_steps(self.block_steps())
+
+    def block_steps(self):
+
+        """
+
+        Parse a block, yielding the steps of every statement in it that contains a block to run_steps
+
         Returns:
             ASTNode: A block node
 
@@ -790,7 +949,15 @@ class Parser:
         statements = [] # Create an empty list to store the statements
 
         while self.crtToken.TokenType != TokenType.RIGHT_BRACE and self.crtToken.TokenType != TokenType.EOF: # Check if the current token is a right brace or EOF
-            statement = self.parse_statement() # Parse the statement
+            statement_index = self.index
+            try:
+                steps = self.compound_statement_steps()
+                statement = self.parse_simple_statement() if steps is None else (yield steps) # Parse the statement
+            except Exception as exception:
+                if not self.error_recovery:
+                    raise
+                self.recover(exception, statement_index) # Skip the rest of the statement and continue with the next one
+                continue
             statements.append(statement) # Append the statement to the list of statements
 
         if self.crtToken.TokenType != TokenType.RIGHT_BRACE: # Check if the current token is a right brace
@@ -809,29 +976,106 @@ class Parser:
         """
 
         self.index += 1
-        if self.index < len(self.tokens):
-            self.crtToken = self.tokens[self.index]
-        if self.index + 1 < len(self.tokens):
-            self.nextToken = self.tokens[self.index + 1]
+        if self.index == 0: # Fill both slots of the window with the first two tokens
+            self.window[0] = next(self.token_iterator, None)
+        self.window[(self.index + 1) & 1] = next(self.token_iterator, None) # Reuse the slot of the token that was just consumed
+
+        if self.window[self.index & 1] is not None:
+            self.crtToken = self.window[self.index & 1]
+        if self.window[(self.index + 1) & 1] is not None:
+            self.nextToken = self.window[(self.index + 1) & 1]
         else:
             self.nextToken = lexer.Token("", lexer.TokenType.EOF, -1)   
 
-    def parse_program(self):
+    def parse_program(self, parallel=False, max_workers=None):
 
         """
 
         Parses the program
 
+        Parameters:
+            parallel (bool): Whether to parse chunks of top-level statements in parallel processes when the program is large
+            max_workers (int): The number of worker processes of the parallel mode, by default the number of CPUs
+
         Returns:
             ASTNode: A program node
 
         """
-    
+
+        if parallel and self.index == -1:
+            token_buffer = self.token_source
+            if token_buffer is None and self.src_program is not None:
+                token_buffer = self.lexer.tokenize(self.src_program)
+                self.token_iterator = iter(token_buffer) # A serial parse reuses the tokens instead of lexing again
+                if self.error_recovery:
+                    self.token_iterator = self.track_error_tokens(self.token_iterator)
+            if isinstance(token_buffer, TokenBuffer):
+                program = parallel_parser.parse_program_parallel(token_buffer, max_workers)
+                if program is not None:
+                    self.ASTroot = program
+                    return self.ASTroot
+
         self.advance()
         while self.crtToken.TokenType != lexer.TokenType.EOF:
-            statement = self.parse_statement()
+            statement_index = self.index
+            try:
+                statement = self.parse_statement()
+            except Exception as exception:
+                if not self.error_recovery:
+                    raise
+                self.recover(exception, statement_index) # Skip the rest of the statement and continue with the next one
+                continue
             self.ASTroot.add_statement(statement)
+
+        if self.error_recovery: # Report the lexical errors before the syntax errors
+            self.errors = self.lexer.errors + self.errors
         return self.ASTroot
+
+    def track_error_tokens(self, tokens):
+
+        """
+
+        Pass the tokens on to the parser, keeping the indices of the ERROR tokens in error_token_indices
+
+        Parameters:
+            tokens (iterator): The tokens of the source program
+
+        Yields:
+            Token: The next token
+
+        """
+
+        for token_index, token in enumerate(tokens):
+            if token.TokenType == TokenType.ERROR:
+                self.error_token_indices.append(token_index)
+            yield token
+
+    def recover(self, exception, statement_index):
+
+        """
+
+        Record a syntax error and skip tokens until a point where parsing can continue, which is after the next ';',
+        before the next '}' or before the next keyword that starts a statement. A syntax error in a statement that
+        contains an ERROR token up to the current token, which is the one that was rejected, is caused by its lexical
+        error, which the lexer has already reported, so it is not recorded again
+
+        Parameters:
+            exception (Exception): The exception raised for the syntax error
+            statement_index (int): The index of the first token of the statement that contains the syntax error
+
+        """
+
+        error_idx = bisect_left(self.error_token_indices, statement_index) # The first ERROR token of the statement, if any
+        if error_idx == len(self.error_token_indices) or self.error_token_indices[error_idx] > self.index: # No invalid lexeme caused the syntax error
+            self.errors.append("".join(str(argument) for argument in exception.args)) # The arguments of the exceptions are parts of the message
+
+        while self.crtToken.TokenType not in SYNCHRONIZING_TOKEN_TYPES: # Skip the rest of the statement
+            self.advance()
+
+        if self.crtToken.TokenType == TokenType.SEMICOLON: # The semicolon ends the statement
+            self.advance()
+        elif self.index == statement_index and self.crtToken.TokenType != TokenType.EOF: # Skip at least one token so that parsing always moves on
+            self.advance()
     
     def Parse(self):        
         self.ASTroot = self.parse_program()
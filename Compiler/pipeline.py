@@ -0,0 +1,89 @@
+"""
+
+This file contains the pipeline of the compiler, which runs every phase on a source program and lexes it only once.
+
+"""
+
+import ast_cache
+from lexer import Lexer
+from parser_ import Parser
+from semantic_analysis_visitor import SemanticAnalysisVisitor
+from code_generation_visitor import CodeGenerationVisitor
+
+def parse_source(src_program_str, lexer=None):
+
+    """
+
+    This function lexes and parses a source program, sharing the tokens between the lexer and the parser.
+
+    Parameters:
+        src_program_str (str): The source program string.
+        lexer (Lexer): The lexer to lex the source program with, by default a new one.
+
+    Returns:
+        TokenBuffer: The tokens of the source program.
+        ASTProgramNode: The AST of the source program.
+
+    """
+
+    lexer = Lexer() if lexer is None else lexer
+    tokens = lexer.tokenize(src_program_str)
+    program_ast = Parser(src_program_str, tokens).parse_program()
+    return tokens, program_ast
+
+def parse_cached(src_program_str, cache_dir=ast_cache.CACHE_DIR, tokens=None):
+
+    """
+
+    This function returns the AST of a source program from the AST cache, or lexes and parses the source program
+    and caches its AST if the source program or the compiler changed since the AST was cached.
+
+    Parameters:
+        src_program_str (str): The source program string.
+        cache_dir (str): The directory that holds the cached ASTs.
+        tokens (TokenBuffer): The tokens of the source program if it has already been lexed.
+
+    Returns:
+        ASTProgramNode: The AST of the source program.
+
+    """
+
+    path = ast_cache.cache_path(src_program_str, cache_dir)
+    program_ast = ast_cache.load_ast(path)
+    if program_ast is None:
+        tokens = Lexer().tokenize(src_program_str) if tokens is None else tokens
+        program_ast = Parser(src_program_str, tokens).parse_program()
+        ast_cache.store_ast(path, program_ast)
+    return program_ast
+
+def compile_source(src_program_str, output_path, print_tokens=False, cache_dir=None):
+
+    """
+
+    This function compiles a source program and writes the generated code to the output file.
+
+    Parameters:
+        src_program_str (str): The source program string.
+        output_path (str): The path of the file the generated code is written to.
+        print_tokens (bool): Whether to print the tokens of the source program before parsing it.
+        cache_dir (str): The directory of the AST cache, or None to always lex and parse the source program.
+
+    Returns:
+        ASTProgramNode: The AST of the source program.
+
+    """
+
+    tokens = None
+    if print_tokens: # The tokens are printed even if the AST is cached
+        tokens = Lexer().tokenize(src_program_str)
+        for token in tokens:
+            print(token.TokenType, token.value, token.line)
+
+    if cache_dir is None:
+        tokens = Lexer().tokenize(src_program_str) if tokens is None else tokens
+        program_ast = Parser(src_program_str, tokens).parse_program()
+    else:
+        program_ast = parse_cached(src_program_str, cache_dir, tokens)
+    program_ast.accept(SemanticAnalysisVisitor())
+    program_ast.accept(CodeGenerationVisitor(output_path))
+    return program_ast
@@ -0,0 +1,76 @@
+"""
+
+This file contains the regular expression engine of the lexer. It tokenizes the input with a single master
+pattern of named groups, one per final state of the DFA, so that the matching runs inside the re module
+and the lexemes are classified exactly like the ones recognized by the DFA.
+
+"""
+
+import re
+from dfa import DFAStates
+from tokens import token_kind_by_final_state, TokenType
+
+# Matches a run of whitespace, line comments and terminated block comments, which the lexer skips without running the DFA
+IGNORED_PATTERN = re.compile(r"(?:[ \t\n]+|//[^\n]*|/\*.*?\*/)*", re.DOTALL)
+
+# Matches the longest ASCII lexeme that the DFA accepts. Each group is named after the final state that the DFA
+# ends in for the lexeme, and the alternatives are ordered so that the first one to match is the longest one.
+MASTER_PATTERN = re.compile(r"""
+    (?P<S_2>->)
+  | (?P<S_1>-)
+  | (?P<S_3>[+*])
+  | (?P<S_4>/)
+  | (?P<S_12>[=!<>]=)
+  | (?P<S_9>=)
+  | (?P<S_10>[<>])
+  | (?P<S_11>!)
+  | (?P<S_13>[(){}\[\],:;])
+  | (?P<S_16>__[A-Za-z][A-Za-z_]*)
+  | (?P<S_17>[A-Za-z][A-Za-z0-9_]*)
+  | (?P<S_20>[0-9]+\.[0-9]+)
+  | (?P<S_18>[0-9]+)
+  | (?P<S_27>\#[0-9A-Fa-f]{6})
+""", re.VERBOSE)
+
+# The final state of the DFA that corresponds to each group of the master pattern
+GROUP_FINAL_STATES = {name: DFAStates[name].value for name in MASTER_PATTERN.groupindex}
+
+def iter_regex_spans(lexer, src_program_str):
+
+    """
+
+    This function lazily generates the spans of the tokens in the source program string using the master pattern.
+    The master pattern only covers ASCII, so the DFA of the lexer is used for any lexeme that the pattern does not
+    match or whose lexeme or lookahead contains other characters. Invalid lexemes therefore raise the same errors.
+
+    Parameters:
+        lexer (Lexer): The lexer whose DFA is used for the lexemes that the master pattern cannot decide.
+        src_program_str (str): The source program string.
+
+    Yields:
+        tuple: The token type, start index and end index of the next non-SKIP token, followed by a final EOF span.
+
+    """
+
+    skip_ignored = IGNORED_PATTERN.match
+    match_lexeme = MASTER_PATTERN.match
+    group_final_states = GROUP_FINAL_STATES
+    is_ascii = src_program_str.isascii() # Only sources with other characters need the lookahead check below
+    end_of_input_idx = len(src_program_str)
+    src_program_idx = skip_ignored(src_program_str, 0).end()
+
+    while src_program_idx < end_of_input_idx:
+        match = match_lexeme(src_program_str, src_program_idx)
+        # The DFA reads at most one character past the lexeme before it stops, e.g. the '.' in '1.x'
+        if match is not None and (is_ascii or src_program_str[src_program_idx:match.end() + 2].isascii()):
+            final_state = group_final_states[match.lastgroup]
+            end_idx = match.end()
+        else:
+            final_state, end_idx = lexer.match_lexeme(src_program_str, src_program_idx)
+
+        token_type = token_kind_by_final_state(final_state, src_program_str[src_program_idx:end_idx])
+        if token_type != TokenType.SKIP:
+            yield token_type, src_program_idx, end_idx
+        src_program_idx = skip_ignored(src_program_str, end_idx).end()
+
+    yield TokenType.EOF, src_program_idx, src_program_idx
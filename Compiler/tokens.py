@@ -4,7 +4,10 @@ This file contains functionality related to tokens that the lexer will use to to
 
 """
 
+import sys
+from array import array
 from enum import Enum
+from types import MappingProxyType
 
 class TokenType(Enum):
 
@@ -84,6 +87,11 @@ class TokenType(Enum):
     # This token is used to represent an error in the input
     ERROR = 41
 
+# The token types indexed by their value, used to turn the kinds stored in a TokenBuffer back into TokenType members
+TOKEN_TYPES_BY_VALUE = [None] * (max(token_type.value for token_type in TokenType) + 1)
+for token_type in TokenType:
+    TOKEN_TYPES_BY_VALUE[token_type.value] = token_type
+
 # Token Class
 class Token:
 
@@ -93,7 +101,9 @@ class Token:
     
     """
 
-    def __init__(self, TokenType, value, line):
+    __slots__ = ("TokenType", "value", "line", "symbol_id")
+
+    def __init__(self, TokenType, value, line, symbol_id=None):
         
         """
         
@@ -103,18 +113,345 @@ class Token:
             TokenType (TokenType): The type of the token.
             value (str): The value of the token.
             line (int): The line number of the token.
+            symbol_id (int): The symbol id of the identifier in the intern table of the lexer, or None for other tokens.
             
         """
 
         self.TokenType = TokenType
         self.value = value
         self.line = line
+        self.symbol_id = symbol_id
+
+class InternTable:
+
+    """
+
+    This class interns the identifiers of a compilation, so that every occurrence of a name is the same string
+    object, which is hashed only once, and has the same dense integer symbol id.
+
+    """
+
+    def __init__(self):
+
+        """
+
+        This function initializes an empty intern table.
+
+        """
+
+        self.symbol_ids = {} # The symbol id of every name
+        self.names = [] # The name of every symbol id
+
+    def intern(self, name):
+
+        """
+
+        This function returns the symbol id of a name, giving it the next symbol id if it has not been seen before.
+
+        Parameters:
+            name (str): The name of the identifier.
+
+        Returns:
+            int: The symbol id of the name.
+
+        """
+
+        symbol_id = self.symbol_ids.get(name)
+        if symbol_id is None:
+            symbol_id = len(self.names)
+            name = sys.intern(name)
+            self.symbol_ids[name] = symbol_id
+            self.names.append(name)
+        return symbol_id
+
+    def __len__(self):
+        return len(self.names)
+
+class TokenBuffer:
+
+    """
+
+    This class stores the tokens of a source program as parallel arrays instead of Token objects.
+    The kinds are stored as the values of their token types, the lexemes are only sliced from the source
+    program and the line numbers are only looked up in the line index when they are requested, and
+    Token objects are only built when a token is indexed or iterated. The parser still reads Token objects,
+    one at a time from __iter__, since it keeps tokens in the AST; only code that scans the arrays itself,
+    like parallel_parser and incremental_parser, avoids building them.
+
+    """
+
+    def __init__(self, src_program_str, line_index, intern_table=None):
+
+        """
+
+        This function initializes an empty token buffer.
+
+        Parameters:
+            src_program_str (str): The source program string the tokens are sliced from.
+            line_index (LineIndex): The newline index of the source program string.
+            intern_table (InternTable): The intern table of the identifiers, by default a new one.
+
+        """
+
+        self.src_program = src_program_str
+        self.line_index = line_index
+        self.intern_table = InternTable() if intern_table is None else intern_table
+        self.kinds = bytearray() # The values of the token types
+        self.starts = array('I') # The index of the first character of each lexeme
+        self.ends = array('I') # The index one past the last character of each lexeme
+        self.symbol_ids = array('i') # The symbol id of each identifier, and -1 for the other tokens
+
+    def append(self, token_type, start, end):
+
+        """
+
+        This function appends a token to the buffer.
+
+        Parameters:
+            token_type (TokenType): The type of the token.
+            start (int): The index of the first character of the lexeme.
+            end (int): The index one past the last character of the lexeme.
+
+        """
+
+        self.kinds.append(token_type.value)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.symbol_ids.append(self.intern_table.intern(self.lexeme(start, end)) if token_type is TokenType.IDENTIFIER else -1)
+
+    def lexeme(self, start, end):
+
+        """
+
+        This function returns the text of the source program between two indices.
+
+        Parameters:
+            start (int): The index of the first character of the lexeme.
+            end (int): The index one past the last character of the lexeme.
+
+        Returns:
+            str: The lexeme.
+
+        """
+
+        return self.src_program[start:end]
+
+    def kind(self, index):
+
+        """
+
+        This function returns the token type of the token at the given index.
+
+        Parameters:
+            index (int): The index of the token.
+
+        Returns:
+            TokenType: The type of the token.
+
+        """
+
+        return TOKEN_TYPES_BY_VALUE[self.kinds[index]]
+
+    def value(self, index):
+
+        """
+
+        This function returns the lexeme of the token at the given index.
+
+        Parameters:
+            index (int): The index of the token.
+
+        Returns:
+            str: The lexeme of the token.
+
+        """
+
+        symbol_id = self.symbol_ids[index]
+        if symbol_id >= 0: # Identifiers are returned from the intern table instead of being sliced again
+            return self.intern_table.names[symbol_id]
+        if self.kinds[index] == TokenType.EOF.value:
+            return "EOF"
+        return self.lexeme(self.starts[index], self.ends[index])
+
+    def symbol_id(self, index):
+
+        """
+
+        This function returns the symbol id of the token at the given index.
+
+        Parameters:
+            index (int): The index of the token.
+
+        Returns:
+            int: The symbol id of the identifier, or None if the token is not an identifier.
+
+        """
+
+        symbol_id = self.symbol_ids[index]
+        return symbol_id if symbol_id >= 0 else None
+
+    def line(self, index):
+
+        """
+
+        This function returns the line number of the token at the given index.
+
+        Parameters:
+            index (int): The index of the token.
+
+        Returns:
+            int: The line number of the first character of the token.
+
+        """
+
+        return self.line_index.line(self.starts[index])
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+
+        """
+
+        This function builds a Token for the token at the given index.
+
+        Parameters:
+            index (int): The index of the token.
+
+        Returns:
+            Token: The token at the given index.
+
+        """
+
+        if index < 0:
+            index += len(self.kinds)
+        return Token(self.kind(index), self.value(index), self.line(index), self.symbol_id(index))
+
+    def __iter__(self):
+
+        """
+
+        This function builds the Tokens of the buffer in order, which is how the parser reads them. The line numbers
+        are counted along the newline index as the tokens advance instead of being looked up for every token.
+
+        Yields:
+            Token: The next token.
+
+        """
+
+        newline_offsets = self.line_index.newline_offsets
+        num_newlines = len(newline_offsets)
+        newlines_before = 0 # The number of newlines before the start of the current token
+        for index in range(len(self.kinds)):
+            start = self.starts[index]
+            while newlines_before < num_newlines and newline_offsets[newlines_before] < start:
+                newlines_before += 1
+            yield Token(TOKEN_TYPES_BY_VALUE[self.kinds[index]], self.value(index), newlines_before + 1, self.symbol_id(index))
+
+# The final state of the DFA that recognizes identifiers and keywords
+IDENTIFIER_FINAL_STATE = 17
+
+# The token types of the keywords, type names and literals recognized by the identifier final state
+KEYWORDS = MappingProxyType({
+    "as": TokenType.AS,
+    "float": TokenType.TYPE,
+    "int": TokenType.TYPE,
+    "bool": TokenType.TYPE,
+    "colour": TokenType.TYPE,
+    "let": TokenType.LET,
+    "return": TokenType.RETURN,
+    "if": TokenType.IF,
+    "else": TokenType.ELSE,
+    "for": TokenType.FOR,
+    "while": TokenType.WHILE,
+    "fun": TokenType.FUN,
+    "true": TokenType.BOOL_LITERAL,
+    "false": TokenType.BOOL_LITERAL,
+    "and": TokenType.MULTIPLICATIVE_OP,
+    "or": TokenType.ADDITIVE_OP,
+    "not": TokenType.NOT_OP,
+})
+
+# The token types of the special functions and literals
+BUILTINS = MappingProxyType({
+    "__width": TokenType.WIDTH,
+    "__height": TokenType.HEIGHT,
+    "__read": TokenType.READ,
+    "__random_int": TokenType.RANDOM_INT,
+    "__print": TokenType.PRINT,
+    "__delay": TokenType.DELAY,
+    "__write_box": TokenType.WRITE_BOX,
+    "__write": TokenType.WRITE,
+})
+
+# The token type of each final state of the DFA that always produces the same token type
+FINAL_STATE_TOKEN_TYPES = MappingProxyType({
+    1: TokenType.ADDITIVE_OP,
+    2: TokenType.FUNC_ASSIGNMENT_OP,
+    4: TokenType.MULTIPLICATIVE_OP,
+    5: TokenType.SKIP,
+    6: TokenType.SKIP,
+    9: TokenType.ASSIGNMENT_OP,
+    18: TokenType.INT_LITERAL,
+    20: TokenType.FLOAT_LITERAL,
+    27: TokenType.COLOR_LITERAL,
+})
+
+# The token types of the lexemes of each final state of the DFA where the lexeme decides the token type
+FINAL_STATE_LEXEME_TOKEN_TYPES = MappingProxyType({
+    3: MappingProxyType({"+": TokenType.ADDITIVE_OP, "*": TokenType.MULTIPLICATIVE_OP}),
+    10: MappingProxyType({">": TokenType.RELATIONAL_OP, "<": TokenType.RELATIONAL_OP}),
+    12: MappingProxyType({"!=": TokenType.RELATIONAL_OP, "==": TokenType.RELATIONAL_OP, ">=": TokenType.RELATIONAL_OP, "<=": TokenType.RELATIONAL_OP}),
+    13: MappingProxyType({
+        "(": TokenType.LEFT_PAREN,
+        ")": TokenType.RIGHT_PAREN,
+        "{": TokenType.LEFT_BRACE,
+        "}": TokenType.RIGHT_BRACE,
+        "[": TokenType.LEFT_SQ_BRACK,
+        "]": TokenType.RIGHT_SQ_BRACK,
+        ",": TokenType.COMMA,
+        ";": TokenType.SEMICOLON,
+        ":": TokenType.COLON,
+    }),
+    16: BUILTINS,
+})
+
+def token_kind_by_final_state(final_state, lexeme):
+
+    """
+
+    This function returns the token type that corresponds to the final state of the DFA and the lexeme,
+    using hash lookups instead of comparing the lexeme against every keyword.
+
+    Parameters:
+        final_state (int): The final state of the DFA.
+        lexeme (str): The lexeme that the DFA has recognized.
+
+    Returns:
+        TokenType: The token type that corresponds to the final state of the DFA.
+
+    """
+
+    if final_state == IDENTIFIER_FINAL_STATE: # Identifiers are the most common tokens so they are checked first
+        return KEYWORDS.get(lexeme, TokenType.IDENTIFIER)
+
+    token_type = FINAL_STATE_TOKEN_TYPES.get(final_state)
+    if token_type is not None:
+        return token_type
+
+    lexeme_token_types = FINAL_STATE_LEXEME_TOKEN_TYPES.get(final_state)
+    if lexeme_token_types is not None:
+        token_type = lexeme_token_types.get(lexeme)
+        if token_type is not None:
+            return token_type
+
+    raise Exception("Invalid token: " + lexeme)
 
 def token_type_by_final_state(final_state, lexeme, line):
 
     """
 
-    This function returns the token type that corresponds to the final state of the DFA.
+    This function returns the token that corresponds to the final state of the DFA.
 
     Parameters:
         final_state (int): The final state of the DFA.
@@ -126,112 +463,4 @@ def token_type_by_final_state(final_state, lexeme, line):
     
     """
 
-    # Match the final state of the DFA to return the corresponding token
-    # The token type is determined by the final state of the DFA and in some cases by the lexeme
-    
-    match (final_state):
-        case 1: 
-            return Token(TokenType.ADDITIVE_OP, lexeme, line)
-        case 2:
-            return Token(TokenType.FUNC_ASSIGNMENT_OP, lexeme, line)
-        case 3 if lexeme == "+":
-            return Token(TokenType.ADDITIVE_OP, lexeme, line)
-        case 3 if lexeme == "*":
-            return Token(TokenType.MULTIPLICATIVE_OP, lexeme, line)
-        case 4:
-            return Token(TokenType.MULTIPLICATIVE_OP, lexeme, line)
-        case 5:
-            return Token(TokenType.SKIP, lexeme, line)
-        case 6:
-            return Token(TokenType.SKIP, lexeme, line)
-        case 9:
-            return Token(TokenType.ASSIGNMENT_OP, lexeme, line)
-        case 10 if lexeme == ">":
-            return Token(TokenType.RELATIONAL_OP, lexeme, line)
-        case 10 if lexeme == "<":
-            return Token(TokenType.RELATIONAL_OP, lexeme, line)
-        case 12 if lexeme == "!=":
-            return Token(TokenType.RELATIONAL_OP, lexeme, line)
-        case 12 if lexeme == "==":
-            return Token(TokenType.RELATIONAL_OP, lexeme, line)
-        case 12 if lexeme == ">=":
-            return Token(TokenType.RELATIONAL_OP, lexeme, line)
-        case 12 if lexeme == "<=":
-            return Token(TokenType.RELATIONAL_OP, lexeme, line)
-        case 13 if lexeme == "(":
-            return Token(TokenType.LEFT_PAREN, lexeme, line)
-        case 13 if lexeme == ")":
-            return Token(TokenType.RIGHT_PAREN, lexeme, line)
-        case 13 if lexeme == "{":
-            return Token(TokenType.LEFT_BRACE, lexeme, line)
-        case 13 if lexeme == "}":
-            return Token(TokenType.RIGHT_BRACE, lexeme, line)
-        case 13 if lexeme == "[":
-            return Token(TokenType.LEFT_SQ_BRACK, lexeme, line)
-        case 13 if lexeme == "]":
-            return Token(TokenType.RIGHT_SQ_BRACK, lexeme, line)
-        case 13 if lexeme == ",":
-            return Token(TokenType.COMMA, lexeme, line)
-        case 13 if lexeme == ";":
-            return Token(TokenType.SEMICOLON, lexeme, line)
-        case 13 if lexeme == ":":
-            return Token(TokenType.COLON, lexeme, line)
-        case 16 if lexeme == "__width":
-            return Token(TokenType.WIDTH, lexeme, line)
-        case 16 if lexeme == "__height":
-            return Token(TokenType.HEIGHT, lexeme, line)
-        case 16 if lexeme == "__read":
-            return Token(TokenType.READ, lexeme, line)
-        case 16 if lexeme == "__random_int":
-            return Token(TokenType.RANDOM_INT, lexeme, line)
-        case 16 if lexeme == "__print":
-            return Token(TokenType.PRINT, lexeme, line)
-        case 16 if lexeme == "__delay":
-            return Token(TokenType.DELAY, lexeme, line)
-        case 16 if lexeme == "__write_box":
-            return Token(TokenType.WRITE_BOX, lexeme, line)
-        case 16 if lexeme == "__write":
-            return Token(TokenType.WRITE, lexeme, line)
-        case 17 if lexeme == "as":
-            return Token(TokenType.AS, lexeme, line)
-        # EXPAND ON THIS
-        case 17 if lexeme == "float":
-            return Token(TokenType.TYPE, lexeme, line)
-        case 17 if lexeme == "int":
-            return Token(TokenType.TYPE, lexeme, line)
-        case 17 if lexeme == "bool":
-            return Token(TokenType.TYPE, lexeme, line)
-        case 17 if lexeme == "colour":
-            return Token(TokenType.TYPE, lexeme, line)
-        case 17 if lexeme == "let":
-            return Token(TokenType.LET, lexeme, line)
-        case 17 if lexeme == "return":
-            return Token(TokenType.RETURN, lexeme, line)
-        case 17 if lexeme == "if":
-            return Token(TokenType.IF, lexeme, line)
-        case 17 if lexeme == "else":
-            return Token(TokenType.ELSE, lexeme, line)
-        case 17 if lexeme == "for":
-            return Token(TokenType.FOR, lexeme, line)
-        case 17 if lexeme == "while":
-            return Token(TokenType.WHILE, lexeme, line)
-        case 17 if lexeme == "fun":
-            return Token(TokenType.FUN, lexeme, line)
-        case 17 if lexeme == "true" or lexeme == "false":
-            return Token(TokenType.BOOL_LITERAL, lexeme, line)
-        case 17 if lexeme == "and":
-            return Token(TokenType.MULTIPLICATIVE_OP, lexeme, line)
-        case 17 if lexeme == "or":
-            return Token(TokenType.ADDITIVE_OP, lexeme, line)
-        case 17 if lexeme == "not":
-            return Token(TokenType.NOT_OP, lexeme, line)
-        case 17:
-            return Token(TokenType.IDENTIFIER, lexeme, line)
-        case 18: 
-            return Token(TokenType.INT_LITERAL, lexeme, line)
-        case 20:
-            return Token(TokenType.FLOAT_LITERAL, lexeme, line)
-        case 27:
-            return Token(TokenType.COLOR_LITERAL, lexeme, line)
-        case _:
-            raise Exception("Invalid token: " + lexeme)
\ No newline at end of file
+    return Token(token_kind_by_final_state(final_state, lexeme), lexeme, line)
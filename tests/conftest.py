@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The compiler modules import each other by their file names, so Compiler/ has to be on the import path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Compiler"))
@@ -0,0 +1,33 @@
+import pickle
+import ast_cache
+from pipeline import compile_source
+
+NESTED_PROGRAM = "let x:int = 0;\n" + "while (x < 1) {\n" * 150 + "x = x + 1;\n" + "}\n" * 150
+
+def test_deeply_nested_program_is_cached(tmp_path):
+    output_path = tmp_path / "output.txt"
+    compile_source(NESTED_PROGRAM, str(output_path))
+    expected_output = output_path.read_text()
+
+    compile_source(NESTED_PROGRAM, str(output_path), cache_dir=str(tmp_path / "cache")) # Caches the AST
+    assert ast_cache.load_ast(ast_cache.cache_path(NESTED_PROGRAM, str(tmp_path / "cache"))) is not None
+    compile_source(NESTED_PROGRAM, str(output_path), cache_dir=str(tmp_path / "cache")) # Loads the AST from the cache
+    assert output_path.read_text() == expected_output
+
+def test_cached_ast_keeps_shared_and_nested_values(tmp_path):
+    src_program_str = "fun f(a:int) -> int { return a * 2; }\nlet x:int[] = [1, 2, 3];\n__print f(x[1]) as int;"
+    program_ast = compile_source(src_program_str, str(tmp_path / "output.txt"))
+    loaded_ast = ast_cache.unflatten_ast(*pickle.loads(pickle.dumps(ast_cache.flatten_ast(program_ast))))
+
+    function, array, print_node = loaded_ast.statements
+    assert function.func_name.value == "f" and function.return_type.line == 1
+    assert [element.val for element in array.array] == ["1", "2", "3"]
+    assert print_node.expression.cast_expr == "int" and print_node.expression.parameters[0].length.val == "1"
+
+def test_ast_that_cannot_be_pickled_is_not_cached(tmp_path, monkeypatch):
+    def failing_dumps(*arguments):
+        raise pickle.PicklingError("cannot pickle")
+    monkeypatch.setattr(ast_cache.pickle, "dumps", failing_dumps)
+
+    compile_source("let x:int = 1;", str(tmp_path / "output.txt"), cache_dir=str(tmp_path / "cache"))
+    assert not (tmp_path / "cache").exists()
@@ -0,0 +1,21 @@
+import os
+import dfa
+from lexer import Lexer
+
+def test_later_lexer_that_asks_for_the_table_cache_writes_it(tmp_path, monkeypatch):
+    monkeypatch.setattr(dfa, "SHARED_DFA", None)
+    monkeypatch.setattr(dfa, "TABLE_CACHE_CHECKED", False)
+    monkeypatch.setattr(dfa, "TABLE_CACHE_PATH", str(tmp_path / "dfa_tables.marshal"))
+
+    plain_lexer = Lexer()
+    assert not os.path.exists(dfa.TABLE_CACHE_PATH)
+
+    cached_lexer = Lexer(use_table_cache=True)
+    assert os.path.exists(dfa.TABLE_CACHE_PATH)
+    assert cached_lexer.dfa is plain_lexer.dfa
+
+def test_table_cache_loads_the_same_dfa(tmp_path):
+    path = str(tmp_path / "dfa_tables.marshal")
+    built_dfa = dfa.load_dfa(path)
+    loaded_dfa = dfa.load_dfa(path)
+    assert (loaded_dfa.table, loaded_dfa.accepting_bitmap) == (built_dfa.table, built_dfa.accepting_bitmap)
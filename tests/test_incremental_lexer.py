@@ -0,0 +1,68 @@
+import random
+import pytest
+import lexer_parity
+from lexer import Lexer
+
+def token_columns(token_buffer):
+
+    """
+
+    This function returns everything that a token buffer holds about its tokens, including the names of the symbol ids.
+
+    """
+
+    return (
+        token_buffer.src_program, bytes(token_buffer.kinds), list(token_buffer.starts), list(token_buffer.ends),
+        [token_buffer.line(index) for index in range(len(token_buffer))],
+        [token_buffer.value(index) for index in range(len(token_buffer))],
+        [token_buffer.intern_table.names[symbol_id] if symbol_id >= 0 else None for symbol_id in token_buffer.symbol_ids],
+    )
+
+def relex_matches_tokenize(src_program_str, edit_offset, deleted_length, inserted_text):
+    lexer = Lexer()
+    edited_src = src_program_str[:edit_offset] + inserted_text + src_program_str[edit_offset + deleted_length:]
+    token_buffer, _ = lexer.relex(lexer.tokenize(src_program_str), edit_offset, deleted_length, inserted_text)
+    return token_columns(token_buffer) == token_columns(Lexer().tokenize(edited_src))
+
+@pytest.mark.parametrize("src_program_str, edit_offset, deleted_length, inserted_text", [
+    ("let x:int = 1;\nlet y:int = 2;\n", 0, 0, "/* "), # Opens a comment that the rest of the program closes below
+    ("let x:int = 1; /* a */ let y:int = 2; /* b */", 20, 2, ""), # Removes the end of a comment, which now ends later
+    ("let x:int = 1; /* a */ let y:int = 2; /* b */", 15, 2, ""), # Removes the start of a comment
+    ("/* a */ let x:int = 1;", 5, 0, "*/ let z:int = 3; /*"), # Closes a comment early and opens another one
+    ("let x:float = 12.5;", 15, 0, " "), # Splits '12.5' into '1' and '2.5'
+    ("let x:float = 1 2.5;", 15, 1, ""), # Joins '1' and '2.5' into '12.5'
+    ("let x:float = 1.2;", 15, 1, ""), # Turns '1.2' into '12'
+    ("let x:float = 1.2;", 17, 0, "x"), # Ends '1.2' before a new identifier 'x'
+    ("let x:int = 1;\nlet y:int = 2;\n__print y;", 14, 0, "\n\n"), # Inserts newlines, which moves the lines after them
+    ("let x:int = 1;\n\n\nlet y:int = 2;\n__print y;", 14, 2, ""), # Deletes newlines
+    ("let abc:int = 1;", 5, 0, "\n"), # Splits an identifier across lines
+])
+def test_relex_matches_tokenize(src_program_str, edit_offset, deleted_length, inserted_text):
+    assert relex_matches_tokenize(src_program_str, edit_offset, deleted_length, inserted_text)
+
+def test_relex_matches_tokenize_for_random_edits():
+    rng = random.Random(0) # A fixed seed, so that a mismatch always shows up on the same edits
+    programs = [src_program_str for _, src_program_str in lexer_parity.example_programs()]
+    pieces = lexer_parity.PROGRAM_PIECES + ["*/", "/*", "*", "/", "."]
+    checked = 0
+    while checked < 3000:
+        if rng.random() < 0.3:
+            src_program_str = rng.choice(programs)
+        else:
+            src_program_str = lexer_parity.random_program(rng, rng.randint(1, 40))
+        edit_offset = rng.randint(0, len(src_program_str))
+        deleted_length = rng.randint(0, min(5, len(src_program_str) - edit_offset))
+        inserted_text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 3)))
+        edited_src = src_program_str[:edit_offset] + inserted_text + src_program_str[edit_offset + deleted_length:]
+        try: # Only edits of valid programs into valid programs are compared, the errors are compared below
+            Lexer().tokenize(src_program_str)
+            Lexer().tokenize(edited_src)
+        except Exception:
+            continue
+        assert relex_matches_tokenize(src_program_str, edit_offset, deleted_length, inserted_text), (src_program_str, edit_offset, deleted_length, inserted_text)
+        checked += 1
+
+def test_relex_raises_like_tokenize():
+    lexer = Lexer()
+    with pytest.raises(Exception):
+        lexer.relex(lexer.tokenize("let x:int = 1;"), 4, 0, "!")
@@ -0,0 +1,66 @@
+import astnodes as ast
+import incremental_parser
+from code_generation_visitor import CodeGenerationVisitor
+from incremental_parser import IncrementalParser
+from parser_ import Parser
+from semantic_analysis_visitor import SemanticAnalysisVisitor
+from tokens import Token
+
+SRC_PROGRAM = "let x:int[] = [1, 2, 3];\nlet y:int = x[1];\n__print x;"
+
+def line_numbers(node):
+
+    """
+
+    This function returns the line numbers of the nodes and tokens of an AST, in the order that they are found in.
+
+    """
+
+    lines = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, Token):
+            lines.append(node.line)
+        elif isinstance(node, ast.ASTNode):
+            lines.extend(getattr(node, name) for name in incremental_parser.LINE_ATTRIBUTES if hasattr(node, name)) # Reused nodes compute them
+            stack.extend(reversed(list(vars(node).values())))
+    return lines
+
+def compile_ast(program_ast, tmp_path):
+    output_path = tmp_path / "output.txt"
+    program_ast.accept(SemanticAnalysisVisitor())
+    program_ast.accept(CodeGenerationVisitor(str(output_path)))
+    return output_path.read_text()
+
+def test_compile_edit_and_compile_again(tmp_path):
+    parser = IncrementalParser()
+    first = parser.parse(SRC_PROGRAM)
+    compile_ast(first, tmp_path)
+
+    edited = SRC_PROGRAM + "\n__print y;"
+    second = parser.parse(edited)
+    assert all(statement is reused for statement, reused in zip(second.statements, first.statements))
+    assert parser.reused == 3 and parser.reparsed == 1
+    assert compile_ast(second, tmp_path) == compile_ast(Parser(edited).parse_program(), tmp_path)
+
+def test_moved_statements_are_reused_with_their_new_lines():
+    parser = IncrementalParser()
+    first = parser.parse(SRC_PROGRAM)
+
+    second = parser.parse("\n\n" + SRC_PROGRAM)
+    assert all(statement is moved for statement, moved in zip(first.statements, second.statements))
+    assert parser.reused == 3 and parser.reparsed == 0
+    assert line_numbers(second) == line_numbers(Parser("\n\n" + SRC_PROGRAM).parse_program())
+
+    third = parser.parse(SRC_PROGRAM)
+    assert line_numbers(third) == line_numbers(Parser(SRC_PROGRAM).parse_program())
+
+def test_statement_that_does_not_parse_alone_falls_back_to_a_full_parse(monkeypatch):
+    monkeypatch.setattr(incremental_parser, "split_statements", lambda token_buffer: [(0, 3), (3, len(token_buffer) - 1)])
+    parser = IncrementalParser()
+    program = parser.parse(SRC_PROGRAM)
+    assert len(program.statements) == 3
+    assert parser.reparsed == 3
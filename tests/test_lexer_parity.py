@@ -0,0 +1,18 @@
+import random
+import pytest
+import lexer_parity
+
+def random_programs(count, seed):
+    rng = random.Random(seed) # A fixed seed, so that a mismatch always shows up on the same programs
+    return [lexer_parity.random_program(rng, rng.randint(1, 80)) for _ in range(count)]
+
+@pytest.mark.parametrize("name, src_program_str", lexer_parity.example_programs())
+def test_engines_agree_on_example_programs(name, src_program_str):
+    assert lexer_parity.compare_engines(src_program_str) == []
+
+def test_engines_agree_on_random_programs():
+    mismatches = [src_program_str for src_program_str in random_programs(500, 0) if lexer_parity.compare_engines(src_program_str)]
+    assert mismatches == []
+
+def test_engines_compared_include_the_regex_engine():
+    assert {"dfa", "regex"} <= set(lexer_parity.AVAILABLE_ENGINES)
@@ -0,0 +1,31 @@
+import pytest
+from lexer import Lexer
+from mapped_lexer import MappedTokenBuffer
+from test_incremental_lexer import token_columns
+
+SRC_PROGRAM_STR = "let x:int = 1; /* a\ncomment */\nlet y:float = 2.5; // b\n__print x + y;\n"
+
+def write_source(tmp_path, data):
+    path = tmp_path / "program.parl"
+    path.write_bytes(data)
+    return str(path)
+
+def test_ascii_files_are_mapped(tmp_path):
+    token_buffer = Lexer().from_path(write_source(tmp_path, SRC_PROGRAM_STR.encode("ascii")))
+    assert isinstance(token_buffer, MappedTokenBuffer)
+    assert [token.value for token in token_buffer] == [token.value for token in Lexer().tokenize(SRC_PROGRAM_STR)]
+
+def test_windows_line_endings_are_read_as_newlines(tmp_path):
+    token_buffer = Lexer().from_path(write_source(tmp_path, SRC_PROGRAM_STR.replace("\n", "\r\n").encode("ascii")))
+    assert token_columns(token_buffer) == token_columns(Lexer().tokenize(SRC_PROGRAM_STR))
+
+@pytest.mark.parametrize("engine", ["dfa", "regex"])
+def test_the_engine_of_the_lexer_is_used(tmp_path, engine):
+    lexer = Lexer(engine=engine)
+    token_buffer = lexer.from_path(write_source(tmp_path, SRC_PROGRAM_STR.encode("ascii")))
+    assert token_columns(token_buffer) == token_columns(Lexer(engine=engine).tokenize(SRC_PROGRAM_STR))
+
+def test_error_recovery_is_used(tmp_path):
+    lexer = Lexer(error_recovery=True)
+    lexer.from_path(write_source(tmp_path, b"let x:int = 1;\n@\nlet y:int = 2;\n"))
+    assert len(lexer.errors) == 1
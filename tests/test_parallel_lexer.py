@@ -0,0 +1,42 @@
+import random
+import pytest
+import lexer_parity
+import parallel_lexer
+from lexer import Lexer
+from test_incremental_lexer import token_columns
+
+def comment_crossing_program(rng, num_lines):
+
+    """
+
+    This function builds a valid program whose block comments span many lines, so that they cross the chunk boundaries.
+
+    """
+
+    lines = []
+    while len(lines) < num_lines:
+        if rng.random() < 0.3:
+            comment_lines = ["/* " + rng.choice(["let", "x", "*", "/", "//", "1.5", ""]) for _ in range(rng.randint(1, 30))]
+            lines.append("\n".join(comment_lines) + " */ let c" + str(len(lines)) + ":int = 1;")
+        else:
+            lines.append("let x" + str(len(lines)) + ":float = " + str(rng.randint(0, 99)) + ".5; // comment")
+    return "\n".join(lines) + "\n"
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(parallel_lexer, "MIN_PARALLEL_SIZE", 0) # Lex even the short test programs in parallel
+
+def test_tokenize_parallel_matches_tokenize(small_chunks):
+    rng = random.Random(0)
+    programs = [comment_crossing_program(rng, rng.randint(1, 300)) for _ in range(10)]
+    programs += [src_program_str for _, src_program_str in lexer_parity.example_programs()]
+    programs.append("let x:int = 1;\n/* never\nterminated\n" + "let y:int = 2;\n" * 50)
+    for src_program_str in programs:
+        for max_workers in (2, 3, 4):
+            try:
+                expected = token_columns(Lexer().tokenize(src_program_str))
+            except Exception:
+                with pytest.raises(Exception):
+                    Lexer().tokenize_parallel(src_program_str, max_workers)
+                continue
+            assert token_columns(Lexer().tokenize_parallel(src_program_str, max_workers)) == expected, (src_program_str, max_workers)
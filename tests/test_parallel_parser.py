@@ -0,0 +1,27 @@
+import gc
+import parallel_parser
+from lexer import Lexer
+from mapped_lexer import MappedTokenBuffer
+from parser_ import Parser
+from test_incremental_parser import compile_ast
+
+SRC_PROGRAM = "".join("fun f" + str(index) + "(x:int) -> int {\n    return x + " + str(index) + ";\n}\n__print f" + str(index) + "(1);\n" for index in range(8))
+
+def test_mapped_token_buffers_are_parsed_in_parallel(tmp_path, monkeypatch):
+    monkeypatch.setattr(parallel_parser, "MIN_PARALLEL_TOKENS", 0) # Parse even the short test program in parallel
+    path = tmp_path / "program.parl"
+    path.write_text(SRC_PROGRAM)
+    token_buffer = Lexer().from_path(str(path))
+    assert isinstance(token_buffer, MappedTokenBuffer)
+    program = parallel_parser.parse_program_parallel(token_buffer, 2)
+    assert program is not None # The chunks are parsed instead of falling back to a serial parse
+    assert compile_ast(program, tmp_path) == compile_ast(Parser(SRC_PROGRAM).parse_program(), tmp_path)
+
+def test_the_cycle_collector_is_left_as_it_was():
+    tokens = Lexer().tokenize("let x:int = 1;")
+    gc.disable()
+    try:
+        assert parallel_parser.parse_chunk(tokens.src_program, 0, 1, bytes(tokens.kinds[:-1]), tokens.starts[:-1].tobytes(), tokens.ends[:-1].tobytes(), tokens.symbol_ids[:-1].tobytes()) is not None
+        assert not gc.isenabled()
+    finally:
+        gc.enable()
@@ -0,0 +1,92 @@
+import pytest
+import astnodes as ast
+import parallel_parser
+from parser_ import Parser
+from pipeline import compile_source
+
+def grouping(node):
+
+    """
+
+    This function writes an expression node with parentheses around every operation, to show how it is grouped.
+
+    """
+
+    if isinstance(node, ast.ASTBinaryOpNode):
+        return "(" + grouping(node.left) + " " + node.op + " " + grouping(node.right) + ")"
+    if isinstance(node, ast.ASTUnaryNode):
+        return "(" + node.operand + " " + grouping(node.expression) + ")"
+    if isinstance(node, ast.ASTRandomNode):
+        return "(__random_int " + grouping(node.expression) + ")"
+    if isinstance(node, ast.ASTVariableNode):
+        return node.var_name
+    return node.val
+
+def parse_print(expression):
+    return Parser("__print " + expression + ";").parse_program().statements[0].expression
+
+@pytest.mark.parametrize("expression, expected", [
+    ("a - b - c", "((a - b) - c)"),
+    ("a + b * c - d", "((a + (b * c)) - d)"),
+    ("a < b + 1", "(a < (b + 1))"),
+    ("a and b or c and d", "((a and b) or (c and d))"),
+])
+def test_binary_operators_group_by_precedence_and_to_the_left(expression, expected):
+    assert grouping(parse_print(expression)) == expected
+
+# As in the grammar, the operand of a prefix operator is the whole expression after it, chains included
+@pytest.mark.parametrize("expression, expected", [
+    ("-a - b - c", "(- ((a - b) - c))"),
+    ("-1 * 2", "(- (1 * 2))"),
+    ("__random_int 10 + 1", "(__random_int (10 + 1))"),
+    ("not a and b and c", "(not ((a and b) and c))"),
+    ("not a < b", "(not (a < b))"),
+    ("a + -b - c", "(a + (- (b - c)))"),
+])
+def test_prefix_operators_apply_to_the_expression_after_them(expression, expected):
+    assert grouping(parse_print(expression)) == expected
+
+@pytest.mark.parametrize("expression, expected", [
+    ("not (a and b)", "(not (a and b))"),
+    ("__random_int (10 + 1)", "(__random_int (10 + 1))"),
+    ("- -a", "(- (- a))"),
+])
+def test_parentheses_apply_prefix_operators_to_an_expression(expression, expected):
+    assert grouping(parse_print(expression)) == expected
+
+def test_cast_applies_to_the_operand_of_a_prefix_operator():
+    node = parse_print("-1 as float")
+    assert grouping(node) == "(- 1)"
+    assert node.cast_expr is None
+    assert node.expression.cast_expr == "float"
+
+@pytest.mark.parametrize("statement", [
+    "let y:int = 1 + -2;",
+    "let y:int = __random_int 5 + 1;",
+    "let b:bool = not true and false;",
+    "let b:bool = not not true;",
+    "let a:int = 1; let b:int = 2; let c:bool = not a < b;",
+    "let y:int = __random_int 10 + 1;",
+])
+def test_prefix_operators_compile_as_operands(statement, tmp_path):
+    compile_source(statement, str(tmp_path / "output.txt"))
+
+@pytest.mark.parametrize("src_program_str, expected_errors", [
+    ("let w:int = @;", ["Invalid lexeme: @ at line 1"]),
+    ("__print x $ 2;", ["Invalid lexeme: $ at line 1"]),
+    ("let x:int = 1 as @;", ["Invalid lexeme: @ at line 1"]),
+    ("let w:int = @;\nlet y:int = ;", ["Invalid lexeme: @ at line 1", "Invalid factor on line 2"]),
+    ("let y:int = ;\nlet w:int = @;", ["Invalid lexeme: @ at line 2", "Invalid factor on line 1"]),
+    ("let y:int = ;\n@ let z:int = 1;", ["Invalid lexeme: @ at line 2", "Invalid factor on line 1"]),
+])
+def test_invalid_lexemes_are_reported_once(src_program_str, expected_errors):
+    parser = Parser(src_program_str, error_recovery=True)
+    parser.parse_program()
+    assert parser.errors == expected_errors
+
+def test_invalid_lexemes_are_reported_once_when_parsing_in_parallel(monkeypatch):
+    monkeypatch.setattr(parallel_parser, "MIN_PARALLEL_TOKENS", 0) # Try the parallel mode even for a short program
+    src_program_str = "fun f(x:int) -> int { return x; }\nlet y:int = ;\n@ let z:int = 1;\nfun g(x:int) -> int { return x; }\n"
+    parser = Parser(src_program_str, error_recovery=True)
+    parser.parse_program(parallel=True, max_workers=2)
+    assert parser.errors == ["Invalid lexeme: @ at line 3", "Invalid factor on line 2"]